@@ -1,16 +1,25 @@
 ﻿import argparse
 import cmd
+import contextlib
 import json
 import os
-import threading
-import time
 import shlex
+import socket
+import time
+from collections import Counter
 from dp.core.config import ConfigManager
 from dp.core.password_manager import PasswordManager
 from dp.core.mapping_manager import MappingManager
 from dp.core.webdav import WebDAVClient
-from dp.core.extractor import Extractor
-import keyring
+from dp.core.extractor import Extractor, ExtractionLimitError
+from dp.core.index_cache import IndexCache
+from dp.core.cracker import PasswordCracker
+from dp.core.candidates import hint_candidates
+from dp.core.batch import BatchJob, BatchRunner, IO_WORKERS, find_archives, search_root
+from dp.core.watcher import FolderWatcher, WATCH_WORKERS
+from dp.core.server import DpServer, DEFAULT_SOCKET
+from dp.core.sync_scheduler import SyncScheduler
+from dp.core.trace import Tracer, summarize
 
 
 class DpCLI(cmd.Cmd):
@@ -20,23 +29,37 @@ class DpCLI(cmd.Cmd):
     def __init__(self):
         super().__init__()
         self.config = ConfigManager()
-        self.pwd_manager = PasswordManager(self.config.get_local_config()['password_file'])
-        self.map_manager = MappingManager(self.config.get_local_config()['mapping_file'])
-        self.webdav = WebDAVClient(self.config.get_webdav_config())
+        self.pwd_manager = PasswordManager(
+            self.config.get_local_config()['password_file'],
+            self.config.get_local_config()['stats_file']
+        )
+        self.map_manager = MappingManager(
+            self.config.get_local_config()['mapping_file'],
+            self.config.get_local_config()['fingerprint_cache']
+        )
+        self.index_cache = IndexCache(self.config.get_local_config()['index_cache'])
+        self.webdav = None  # 登录时才创建，Local 模式下不加载 WebDAV 和 keyring
         self.extractor = Extractor()
-        self.sync_thread = None
+        self.cracker = PasswordCracker(self.config.get_local_config()['workers'])
+        self.tracer = Tracer(self.config.get_local_config()['trace_file'])
+        self.scheduler = None
         self._is_online = False  # 初始状态为 Local
         self._start_sync()
 
     def _start_sync(self):
-        if self._is_online:
-            self.sync_thread = threading.Thread(target=self._sync_loop, daemon=True)
-            self.sync_thread.start()
+        if self._is_online:  # 仅在 Online 状态下同步
+            if self.scheduler:
+                self.scheduler.stop()
+            self.scheduler = SyncScheduler(
+                self.webdav, self.pwd_manager, self.map_manager,
+                self.config.get_webdav_config()['sync_interval'], self.tracer
+            )
+            self.scheduler.start()
 
-    def _sync_loop(self):
-        while self._is_online:  # 仅在 Online 状态下同步
-            self.webdav.sync(self.pwd_manager, self.map_manager)
-            time.sleep(600)  # 10 minutes
+    def _notify_change(self):
+        """Let the background sync push local changes (debounced)"""
+        if self.scheduler:
+            self.scheduler.notify_change()
 
     def parse_args(self, arg):
         """统一参数解析函数"""
@@ -88,6 +111,7 @@ class DpCLI(cmd.Cmd):
             return
 
         # 使用keyring获取密码
+        import keyring
         password = keyring.get_password('webdav', username)
         if not password:
             print("WebDAV password is not found in keyring.")
@@ -98,8 +122,13 @@ class DpCLI(cmd.Cmd):
             self.webdav = WebDAVClient(webdav_config)
             print("Successfully logged in to WebDAV.")
             self._is_online = True  # 登录成功，状态为 Online
-            self.webdav.sync(self.pwd_manager, self.map_manager)
-            print("Initial sync completed.")
+            trace = self.tracer.start('sync')
+            ok = self.webdav.sync(self.pwd_manager, self.map_manager, trace)
+            self.tracer.finish(trace, ok)
+            if ok:
+                print("Initial sync completed.")
+            else:
+                print("Initial sync failed, will retry in the background.")
             self._start_sync()
         except Exception as e:
             print(f"Login failed: {e}")
@@ -120,9 +149,11 @@ class DpCLI(cmd.Cmd):
 
         if args.password and not args.map_password:
             self.pwd_manager.add(args.password)
+            self._notify_change()
             print("Password added")
         elif args.password and args.map_password:
             self.map_manager.add(args.password, args.map_password)
+            self._notify_change()
             print("Mapping added")
         else:
             print("Invalid arguments")
@@ -143,11 +174,12 @@ class DpCLI(cmd.Cmd):
         if args.type == 'passwords':
             with open(args.file, 'r') as f:
                 self.pwd_manager.merge([line.strip() for line in f])
+            self._notify_change()
             print("Passwords imported")
         elif args.type == 'mappings':
             with open(args.file, 'r') as f:
-                self.map_manager.mappings.update(json.load(f))
-            self.map_manager._save()
+                self.map_manager.update(json.load(f))
+            self._notify_change()
             print("Mappings imported")
 
     def do_export(self, arg):
@@ -166,40 +198,350 @@ class DpCLI(cmd.Cmd):
         with open(f"{args.dir}/passwords.txt", 'w') as f:
             f.write('\n'.join(self.pwd_manager.passwords))
         with open(f"{args.dir}/mappings.json", 'w') as f:
-            json.dump(self.map_manager.mappings, f)
+            json.dump(self.map_manager.snapshot(), f)
         print(f"Data exported to {args.dir}")
 
     def do_dp(self, arg):
-        """Decompress file: dp <file> [output_dir]"""
+        """Decompress file: dp <file> [output_dir] [--nested] [--incremental] or dp --recursive <dir|glob> [output_dir] [--jobs N]"""
+        # 返回值会被 cmd 当作退出标志，这里不向上传递
+        self.run_dp(arg)
+
+    def run_dp(self, arg):
+        """Run a dp command line; returns True when every archive was extracted"""
         parser = argparse.ArgumentParser(description="File decompression")
-        parser.add_argument('file', type=str, help="The file to decompress")
+        parser.add_argument('file', type=str, help="The file to decompress, or a directory/glob with --recursive")
         parser.add_argument('output_dir', type=str, nargs='?', help="The output directory (default: source file's directory)")
+        parser.add_argument('-r', '--recursive', action='store_true', help="Decompress every archive in a directory or glob")
+        parser.add_argument('-j', '--jobs', type=int, default=0, help="Password discovery processes (default: config workers)")
+        parser.add_argument('--io-jobs', type=int, default=IO_WORKERS, help="Concurrent lookups and extractions")
+        parser.add_argument('-n', '--nested', action='store_true', help="Also extract archives found inside the archive")
+        parser.add_argument('-i', '--incremental', action='store_true', help="Only write files that differ from the existing output")
 
         try:
             arg = arg.replace("\\", "/")
             args = parser.parse_args(shlex.split(arg))
         except SystemExit:
-            print("Invalid command format for 'dp'. Usage: dp <file> [output_dir]")
-            return
+            print("Invalid command format for 'dp'. Usage: dp <file> [output_dir] or dp --recursive <dir|glob> [output_dir]")
+            return False
+
+        if args.recursive:
+            return self._dp_batch(args)
 
         file_path = args.file
         # 如果没有指定输出目录，则使用源文件的目录，并创建一个同名文件夹
         if not args.output_dir:
-            output_dir = os.path.join(os.path.dirname(file_path), os.path.splitext(os.path.basename(file_path))[0])
-            os.makedirs(output_dir, exist_ok=True)
+            output_dir = os.path.join(os.path.dirname(file_path), Extractor.strip_extension(os.path.basename(file_path)))
         else:
             output_dir = args.output_dir
+        return self._decompress(file_path, output_dir, args.nested, args.incremental)
+
+    def _decompress(self, file_path, output_dir, nested=False, incremental=False):
+        """Look up, discover the password and extract one archive; returns True on success"""
+        trace = self.tracer.start('dp', file_path)
+        ok = False
+        try:
+            ok = self._decompress_traced(trace, file_path, output_dir, nested, incremental)
+            return ok
+        finally:
+            self.tracer.finish(trace, ok)
+
+    def _decompress_traced(self, trace, file_path, output_dir, nested, incremental):
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            with trace.phase('detect'):
+                session = self.extractor.open_session(file_path)
+        except Exception as e:
+            print(f"Failed to open archive: {e}")
+            return False
+
+        source_dir = os.path.dirname(os.path.abspath(file_path))
+        with session:
+            result = self._find_password(session, file_path, trace)
+            while True:
+                if not result.found:
+                    print("Failed to extract with all passwords")
+                    return False
+                pwd = result.password
+                try:
+                    # 只在真正解压时计入字节数，stats 用它除以解压阶段耗时
+                    trace.count('archive_bytes', os.path.getsize(file_path))
+                    with trace.phase('extract'):
+                        if nested:
+                            self._extract_nested(session, output_dir, pwd, source_dir)
+                        else:
+                            skipped = session.extract_all(output_dir, pwd, incremental=incremental)
+                            if skipped:
+                                print(f"Skipped {skipped} unchanged files")
+                    break
+                except ExtractionLimitError as e:
+                    print(f"Extraction stopped: {e}")
+                    return False
+                except Exception as e:
+                    print(f"Extraction failed with password {pwd}: {e}")
+                # 校验通过但解压失败，多半是校验误判，继续尝试剩下的候选
+                result = self._crack(session, result.remaining, trace)
+        print(f"Successfully extracted with password: {pwd}")
+        self._remember(file_path, pwd)
+        return True
+
+    def _find_password(self, session, file_path, trace=None):
+        """Discover the password of an open session; returns a CrackResult"""
+        # Try the mapped password first, then hints from the file name, comment
+        # and sidecar files, then passwords that hit before; only then pay for
+        # a full-hash lookup of pre-upgrade mappings and the rest of the book.
+        # Verify cheaply first, extract only with a matching one
+        phase = trace.phase if trace else lambda name: contextlib.nullcontext()
+        source_dir = os.path.dirname(os.path.abspath(file_path))
+        with phase('lookup'):
+            mapped = self.map_manager.get(file_path)
+            hints = hint_candidates(file_path, session.comment(), self.config.get_local_config()['candidate_rules'])
+            head = [None] + ([mapped] if mapped else []) + hints
+            head = list(dict.fromkeys(head + self.pwd_manager.hits(source_dir)))
+            tried = set(head)
+            rest = [p for p in self.pwd_manager.ordered(source_dir) if p not in tried]
+        with phase('discover'):
+            result = self.cracker.crack(session, head)
+        if result.found:
+            result.remaining = list(result.remaining) + rest
+        else:
+            with phase('lookup'):
+                legacy = self.map_manager.get_legacy(file_path)
+            if legacy is not None and legacy not in tried:
+                rest = [legacy] + [p for p in rest if p != legacy]
+            with phase('discover'):
+                more = self.cracker.crack(session, rest)
+            more.attempts += result.attempts
+            more.elapsed += result.elapsed
+            result = more
+        if trace:
+            trace.count('attempts', result.attempts)
+        print(f"Tried {result.attempts} passwords in {result.elapsed:.2f}s ({result.rate:.1f}/s)")
+        return result
+
+    def _crack(self, session, passwords, trace=None):
+        phase = trace.phase if trace else lambda name: contextlib.nullcontext()
+        with phase('discover'):
+            result = self.cracker.crack(session, passwords)
+        if trace:
+            trace.count('attempts', result.attempts)
+        print(f"Tried {result.attempts} passwords in {result.elapsed:.2f}s ({result.rate:.1f}/s)")
+        return result
+
+    def _remember(self, file_path, pwd):
+        if pwd:
+            if pwd not in self.pwd_manager:
+                # 从文件名、注释等线索中找到的新密码收入密码本
+                self.pwd_manager.add(pwd)
+                print(f"Learned new password: {pwd}")
+            self.map_manager.add(file_path, pwd)
+            self.pwd_manager.record_hit(pwd, os.path.dirname(os.path.abspath(file_path)))
+            self._notify_change()
+
+    def do_ls(self, arg):
+        """List archive members from its index without extracting: ls <archive>"""
+        parser = argparse.ArgumentParser(description="List archive members")
+        parser.add_argument('file', type=str, help="The archive to list")
+        try:
+            arg = arg.replace("\\", "/")
+            args = parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            print("Invalid command format for 'ls'. Usage: ls <archive>")
+            return
 
-        # Try known passwords
-        passwords = [None] + self.pwd_manager.passwords
-        for pwd in passwords:
-            if self.extractor.extract(file_path, output_dir, pwd):
-                print(f"Successfully extracted with password: {pwd}")
-                if pwd:
-                    self.map_manager.add(file_path, pwd)
+        file_path = args.file
+        try:
+            key = self.map_manager.fingerprints.fingerprint(file_path)
+        except OSError as e:
+            print(f"Failed to open archive: {e}")
+            return
+        # 指纹冲突的归档不走缓存
+        members = None if key in self.map_manager.fingerprints.ties else self.index_cache.get(key)
+        if members is None:
+            try:
+                session = self.extractor.open_session(file_path)
+            except Exception as e:
+                print(f"Failed to open archive: {e}")
                 return
-        print("Failed to extract with all passwords")
+            with session:
+                pwd = None
+                if session.index_encrypted():
+                    result = self._find_password(session, file_path)
+                    if not result.found:
+                        print("Failed to read the archive index with all passwords")
+                        return
+                    pwd = result.password
+                    self._remember(file_path, pwd)
+                try:
+                    members = session.members(pwd)
+                except Exception as e:
+                    print(f"Failed to read the archive index: {e}")
+                    return
+            self.index_cache.put(key, members)
 
+        print(f"{'Size':>12}  {'Compressed':>12}  {'Modified':<16}  Name")
+        for m in members:
+            compressed = '' if m.compressed is None else m.compressed
+            modified = time.strftime('%Y-%m-%d %H:%M', time.localtime(m.mtime)) if m.mtime is not None else ''
+            name = m.name + ('/' if m.is_dir and not m.name.endswith('/') else '')
+            print(f"{'' if m.is_dir else m.size:>12}  {compressed:>12}  {modified:<16}  {name}")
+        files = [m for m in members if not m.is_dir]
+        print(f"{sum(m.size for m in files):>12}  {'':>12}  {'':<16}  {len(files)} files")
+
+    def do_test(self, arg):
+        """Check every member's CRC without writing to disk: test <archive>"""
+        parser = argparse.ArgumentParser(description="Test archive integrity")
+        parser.add_argument('file', type=str, help="The archive to test")
+        try:
+            arg = arg.replace("\\", "/")
+            args = parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            print("Invalid command format for 'test'. Usage: test <archive>")
+            return
+
+        file_path = args.file
+        try:
+            session = self.extractor.open_session(file_path)
+        except Exception as e:
+            print(f"Failed to open archive: {e}")
+            return
+        with session:
+            result = self._find_password(session, file_path)
+            if not result.found:
+                print("Failed to test with all passwords")
+                return
+            failures = session.test(result.password)
+        for name, error in failures:
+            print(f"FAILED {name}: {error}")
+        if failures:
+            print(f"{len(failures)} members failed the integrity check")
+        else:
+            print("All members passed the integrity check")
+            self._remember(file_path, result.password)
+
+
+    def _extract_nested(self, session, output_dir, pwd, source_dir):
+        """Extract an archive and the archives inside it, discovering each layer's password"""
+        ordered = self.pwd_manager.ordered(source_dir)
+
+        def discover(inner, name):
+            result = self.cracker.crack(inner, [None] + ordered)
+            while result.found:
+                if result.password:
+                    self.pwd_manager.record_hit(result.password, source_dir)
+                yield result.password
+                # 上一个密码解压失败，接着找
+                result = self.cracker.crack(inner, result.remaining)
+            print(f"No password found for inner archive {name}, kept as is")
+
+        local_config = self.config.get_local_config()
+        expanded = self.extractor.extract_nested(
+            session, output_dir, pwd, discover,
+            local_config['nested_max_depth'], local_config['nested_max_size_mb'] * 1024 * 1024
+        )
+        if expanded:
+            print(f"Extracted {expanded} inner archives")
+
+    def _dp_batch(self, args):
+        files = find_archives(args.file)
+        if not files:
+            print(f"No archives found in {args.file}")
+            return False
+
+        base = search_root(args.file)
+        planned = []
+        for file_path in files:
+            stem = Extractor.strip_extension(file_path)
+            if args.output_dir:
+                relative = os.path.relpath(stem, base)
+                # 相对路径不能跳出输出目录
+                if relative.split(os.sep)[0] == os.pardir:
+                    print(f"Skipped {file_path}: outside {base}")
+                    continue
+                output_dir = os.path.join(args.output_dir, relative)
+            else:
+                output_dir = stem
+            planned.append((file_path, stem, output_dir))
+
+        # t.tar、t.tar.gz 这类同名归档会解到同一目录并被同时写入，冲突时保留格式后缀区分
+        counts = Counter(os.path.normcase(os.path.abspath(o)) for _, _, o in planned)
+        jobs = []
+        for file_path, stem, output_dir in planned:
+            if counts[os.path.normcase(os.path.abspath(output_dir))] > 1:
+                output_dir += '_' + file_path[len(stem):].lstrip('.').replace('.', '_')
+            jobs.append(BatchJob(file_path, output_dir))
+
+        finished = []
+
+        def on_status(job):
+            if job.status in ('done', 'failed'):
+                finished.append(job)
+                counters = {'attempts': job.attempts}
+                if 'extract' in job.timings:
+                    counters['archive_bytes'] = job.size
+                self.tracer.record('dp', job.file_path, job.timings, job.status == 'done', counters)
+                detail = f"password: {job.password}" if job.status == 'done' else job.error
+                print(f"[{len(finished)}/{len(jobs)}] {job.status} {job.file_path} ({detail})")
+
+        runner = BatchRunner(
+            self.extractor, self.pwd_manager, self.map_manager,
+            args.jobs or self.config.get_local_config()['workers'], args.io_jobs, args.incremental,
+            self.config.get_local_config()['candidate_rules']
+        )
+        report = runner.run(jobs, on_status)
+        print(report.summary())
+        if report.done:
+            self._notify_change()
+        return len(report.done) == len(files)
+
+    def do_watch(self, arg):
+        """Watch a directory and extract new archives: watch <dir> [--workers N]"""
+        parser = argparse.ArgumentParser(description="Watch a directory for new archives.")
+        parser.add_argument('dir', type=str, help="The directory to watch")
+        parser.add_argument('--workers', type=int, default=WATCH_WORKERS, help="Archives processed concurrently")
+
+        try:
+            arg = arg.replace("\\", "/")
+            args = parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            print("Invalid command format for 'watch'. Usage: watch <dir> [--workers N]")
+            return
+
+        if not os.path.isdir(args.dir):
+            print(f"Not a directory: {args.dir}")
+            return
+
+        watcher = FolderWatcher(
+            args.dir, self._decompress,
+            self.config.get_local_config()['watch_state'], args.workers
+        )
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            watcher.stop()
+            print("Stopped watching.")
+
+    def do_serve(self, arg):
+        """Serve dp jobs over a local Unix socket: serve [socket]"""
+        parser = argparse.ArgumentParser(description="Run a persistent dp server.")
+        parser.add_argument('socket', type=str, nargs='?', default=DEFAULT_SOCKET, help="Unix socket path")
+
+        try:
+            args = parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            print("Invalid command format for 'serve'. Usage: serve [socket]")
+            return
+
+        if not hasattr(socket, 'AF_UNIX'):
+            print("Server mode needs Unix socket support on this platform.")
+            return
+
+        server = DpServer(self, args.socket)
+        option = '' if args.socket == DEFAULT_SOCKET else f" --socket {shlex.quote(args.socket)}"
+        print(f"Serving on {args.socket}, submit jobs with: python main.py submit{option} <file> [output_dir]")
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            print("Server stopped.")
 
     def do_exit(self, arg):
         """Exit the program"""
@@ -217,6 +559,82 @@ class DpCLI(cmd.Cmd):
         except Exception as e:
             print(f"Upload failed: {e}")
 
+    def do_startup(self, arg):
+        """Check that starting dp stays within its time budget: startup"""
+        from dp.core.startup import check_startup, STARTUP_BUDGET_SECONDS
+        elapsed, loaded = check_startup()
+        print(f"Startup: {elapsed * 1000:.0f} ms (budget {STARTUP_BUDGET_SECONDS * 1000:.0f} ms)")
+        if loaded:
+            print(f"Heavy modules imported at startup: {', '.join(loaded)}")
+        if elapsed > STARTUP_BUDGET_SECONDS or loaded:
+            print("Startup budget exceeded.")
+
+    def do_stats(self, arg):
+        """Show per-phase timings of recorded runs: stats [--command dp|sync]"""
+        parser = argparse.ArgumentParser(description="Show per-phase timings")
+        parser.add_argument('--command', type=str, help="Only show this command")
+        try:
+            args = parser.parse_args(shlex.split(arg))
+        except SystemExit:
+            print("Invalid command format for 'stats'. Usage: stats [--command dp|sync]")
+            return
+
+        summary = summarize(self.tracer.history())
+        if args.command:
+            summary = {k: v for k, v in summary.items() if k == args.command}
+        if not summary:
+            print("No timings recorded yet.")
+            return
+        for command, entry in sorted(summary.items()):
+            print(f"{command}: {entry['runs']} runs, {entry['ok']} succeeded")
+            print(f"  {'phase':<10} {'count':>6} {'mean ms':>10} {'p50 ms':>10} {'max ms':>10}")
+            for name, (count, total, mean, p50, peak) in entry['phases'].items():
+                print(f"  {name:<10} {count:>6} {mean * 1000:>10.1f} {p50 * 1000:>10.1f} {peak * 1000:>10.1f}")
+            phases, counters = entry['phases'], entry['counters']
+            # 由阶段总耗时和计数推算单次尝试的耗时与解压吞吐
+            if counters.get('attempts') and 'discover' in phases:
+                print(f"  {phases['discover'][1] * 1000 / counters['attempts']:.2f} ms per password trial")
+            if counters.get('archive_bytes') and phases.get('extract', [0, 0])[1]:
+                print(f"  {counters['archive_bytes'] / phases['extract'][1] / 2 ** 20:.1f} MiB/s extracted (archive size)")
+            for name, value in counters.items():
+                print(f"  {name}: {value}")
+
+    def do_bench(self, arg):
+        """Benchmark every phase on synthetic archives: bench [--sizes 1,16] [--book N] [--ranks 1,100,1000] [--max-seconds S] [--json FILE]"""
+        from dp.core.bench import FORMATS, MAX_BOOK, run_benchmarks
+        parser = argparse.ArgumentParser(description="Benchmark on synthetic archives")
+        parser.add_argument('--sizes', type=str, default='1,16', help="Payload sizes in MiB, comma separated")
+        parser.add_argument('--book', type=int, default=10000, help=f"Synthetic password book size (at most {MAX_BOOK})")
+        parser.add_argument('--ranks', type=str, default='1,100,1000', help="Ranks of the right password in the book")
+        parser.add_argument('--max-seconds', type=float, default=30, help="Estimate instead of running cracks longer than this")
+        parser.add_argument('--formats', type=str, default=','.join(FORMATS), help="Archive formats, comma separated")
+        parser.add_argument('--json', type=str, help="Also write the results to this file")
+        try:
+            arg = arg.replace("\\", "/")
+            args = parser.parse_args(shlex.split(arg))
+            sizes = [int(v) for v in args.sizes.split(',') if v.strip()]
+            ranks = [int(v) for v in args.ranks.split(',') if v.strip()]
+            formats = [v.strip() for v in args.formats.split(',') if v.strip()]
+        except (SystemExit, ValueError):
+            print("Invalid command format for 'bench'. Usage: bench [--sizes 1,16] [--book N] [--ranks 1,100,1000] [--max-seconds S] [--json FILE]")
+            return
+        unknown = [f for f in formats if f not in FORMATS]
+        if unknown or not 0 < args.book <= MAX_BOOK or not sizes or min(sizes) < 1:
+            print(f"Formats must be among {', '.join(FORMATS)}, sizes at least 1 MiB and the book 1-{MAX_BOOK} entries.")
+            return
+
+        rows = run_benchmarks(sizes, args.book, ranks, args.max_seconds, self.config.get_local_config()['workers'], formats)
+        group = None
+        for name, case, value, unit in rows:
+            if name != group:
+                group = name
+                print(f"{group}:")
+            print(f"  {case:<28} {value:>12.3f} {unit}")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump([{'group': g, 'case': c, 'value': v, 'unit': u} for g, c, v, u in rows], f, indent=2)
+            print(f"Results written to {args.json}")
+
     def postcmd(self, stop, line):
         # 常驻状态显示
         status = "Online" if self._is_online else "Local"
@@ -0,0 +1,209 @@
+﻿import glob
+import itertools
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dp.core.candidates import DEFAULT_RULES, hint_candidates
+from dp.core.extractor import Extractor
+
+# 指纹查找和解压以磁盘 I/O 为主，默认并发数与 CPU 数无关
+IO_WORKERS = 4
+
+_book = None
+_rules = DEFAULT_RULES
+
+
+def _init_discovery(book, rules=DEFAULT_RULES):
+    global _book, _rules
+    _book = book
+    _rules = rules
+
+
+def _discover(file_path, head, after=0, with_book=True):
+    """Try the head candidates, then (with_book) the rest of the book, inside a worker process.
+
+    The first `after` candidates are skipped, to resume past a password that
+    verified but did not extract. Returns (password, found, attempts, elapsed, position).
+    """
+    start = time.perf_counter()
+    attempts = 0
+    with Extractor().open_session(file_path) as session:
+        # 注释要打开归档才能读到，在这里补进头部候选
+        comment = session.comment()
+        if comment:
+            head = list(dict.fromkeys(head + hint_candidates(file_path, comment, _rules, sidecars=False)))
+        tried = set(head)
+        candidates = itertools.chain(head, (p for p in _book if p not in tried) if with_book else ())
+        for position, pwd in enumerate(itertools.islice(candidates, after, None), after + 1):
+            attempts += 1
+            if session.try_password(pwd):
+                return pwd, True, attempts, time.perf_counter() - start, position
+    return None, False, attempts, time.perf_counter() - start, after + attempts
+
+
+def find_archives(target):
+    """Archives under a directory (recursively) or matching a glob pattern"""
+    if os.path.isdir(target):
+        paths = [os.path.join(root, name) for root, _, names in os.walk(target) for name in sorted(names)]
+    else:
+        paths = sorted(glob.glob(target, recursive=True))
+    return [p for p in paths if os.path.isfile(p) and Extractor.is_archive(p)]
+
+
+def search_root(target):
+    """Directory that find_archives(target) searches: target itself, or the glob's longest literal prefix"""
+    if os.path.isdir(target):
+        return target
+    parts = []
+    for part in os.path.dirname(target).split('/'):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return '/'.join(parts) or ('/' if target.startswith('/') else '.')
+
+
+class BatchJob:
+    def __init__(self, file_path, output_dir):
+        self.file_path = file_path
+        self.output_dir = output_dir
+        self.size = os.path.getsize(file_path)
+        self.status = 'queued'
+        self.password = None
+        self.attempts = 0
+        self.error = None
+        self.timings = {}
+        self.head = []
+        self.with_book = True
+        self.position = 0  # 已尝试过的候选数，解压失败时从这里继续查找
+
+
+class BatchReport:
+    def __init__(self, jobs, elapsed):
+        self.jobs = jobs
+        self.elapsed = elapsed
+
+    @property
+    def done(self):
+        return [job for job in self.jobs if job.status == 'done']
+
+    @property
+    def failed(self):
+        return [job for job in self.jobs if job.status == 'failed']
+
+    def summary(self):
+        total_bytes = sum(job.size for job in self.done)
+        elapsed = self.elapsed or 1e-9
+        lines = [
+            f"Processed {len(self.jobs)} archives in {self.elapsed:.1f}s: "
+            f"{len(self.done)} done, {len(self.failed)} failed",
+            f"Throughput: {len(self.done) / elapsed:.2f} archives/s, {total_bytes / elapsed / 2 ** 20:.1f} MiB/s",
+            f"Password attempts: {sum(job.attempts for job in self.jobs)}",
+        ]
+        used = Counter(job.password for job in self.done)
+        if used:
+            lines.append("Passwords used:")
+            lines += [f"  {pwd if pwd is not None else '(none)'}: {count}" for pwd, count in used.most_common()]
+        if self.failed:
+            lines.append("Failures:")
+            lines += [f"  {job.file_path}: {job.error}" for job in self.failed]
+        return '\n'.join(lines)
+
+
+class BatchRunner:
+    """Three-stage pipeline: mapping lookup, password discovery and extraction overlap across archives"""
+
+    def __init__(self, extractor, password_manager, mapping_manager, workers=0, io_workers=IO_WORKERS,
+                 incremental=False, candidate_rules=DEFAULT_RULES):
+        self.extractor = extractor
+        self.password_manager = password_manager
+        self.mapping_manager = mapping_manager
+        self.workers = workers or os.cpu_count() or 1
+        self.io_workers = io_workers
+        self.incremental = incremental
+        self.candidate_rules = candidate_rules
+
+    def _lookup(self, job):
+        start = time.perf_counter()
+        source_dir = os.path.dirname(os.path.abspath(job.file_path))
+        mapped = self.mapping_manager.get(job.file_path)
+        head = [None] + ([mapped] if mapped else [])
+        head += hint_candidates(job.file_path, rules=self.candidate_rules)
+        head = list(dict.fromkeys(head + self.password_manager.hits(source_dir)))
+        job.timings['lookup'] = time.perf_counter() - start
+        return head
+
+    def _extract(self, job):
+        start = time.perf_counter()
+        os.makedirs(job.output_dir, exist_ok=True)
+        with self.extractor.open_session(job.file_path) as session:
+            session.extract_all(job.output_dir, job.password, progress=False, incremental=self.incremental)
+        job.timings['extract'] = time.perf_counter() - start
+
+    def _record(self, job):
+        if job.password:
+            self.password_manager.add(job.password)
+            self.mapping_manager.add(job.file_path, job.password)
+            self.password_manager.record_hit(job.password, os.path.dirname(os.path.abspath(job.file_path)))
+
+    def run(self, jobs, on_status=None):
+        def update(job, status, error=None):
+            job.status = status
+            job.error = error
+            if on_status:
+                on_status(job)
+
+        start = time.perf_counter()
+        book = self.password_manager.passwords
+        with ThreadPoolExecutor(self.io_workers) as lookup_pool, \
+                ProcessPoolExecutor(self.workers, initializer=_init_discovery, initargs=(book, self.candidate_rules)) as discover_pool, \
+                ThreadPoolExecutor(self.io_workers) as extract_pool:
+            running = {}
+            for job in jobs:
+                update(job, 'lookup')
+                running[lookup_pool.submit(self._lookup, job)] = (job, 'lookup')
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job, stage = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if stage == 'extract':
+                            # 校验通过但解压失败，多半是校验误判，从下一个候选继续查找
+                            job.error = f"extract: {e}"
+                            update(job, 'cracking', job.error)
+                            running[discover_pool.submit(
+                                _discover, job.file_path, job.head, job.position, job.with_book)] = (job, 'discover')
+                        else:
+                            update(job, 'failed', f"{stage}: {e}")
+                        continue
+                    if stage == 'lookup':
+                        job.head = result
+                        update(job, 'cracking')
+                        running[discover_pool.submit(_discover, job.file_path, result)] = (job, 'discover')
+                    elif stage == 'discover':
+                        job.password, found, attempts, elapsed, job.position = result
+                        job.attempts += attempts
+                        job.timings['discover'] = job.timings.get('discover', 0) + elapsed
+                        if not found:
+                            if job.with_book and self.mapping_manager.has_legacy:
+                                # 密码本里都不对时才读整个文件，查升级前以完整哈希为键的映射
+                                running[lookup_pool.submit(self.mapping_manager.get_legacy, job.file_path)] = (job, 'legacy')
+                                continue
+                            # 曾经解压失败的，报告解压错误而不是“没有密码”
+                            update(job, 'failed', job.error or "no matching password")
+                            continue
+                        update(job, 'extracting')
+                        running[extract_pool.submit(self._extract, job)] = (job, 'extract')
+                    elif stage == 'legacy':
+                        job.with_book = False
+                        if result is None:
+                            update(job, 'failed', job.error or "no matching password")
+                            continue
+                        job.head, job.position = [result], 0
+                        running[discover_pool.submit(_discover, job.file_path, job.head, 0, False)] = (job, 'discover')
+                    else:
+                        self._record(job)
+                        update(job, 'done')
+        return BatchReport(jobs, time.perf_counter() - start)
@@ -0,0 +1,236 @@
+﻿import hashlib
+import io
+import itertools
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from dp.core.extractor import Extractor
+from dp.core.cracker import PasswordCracker
+from dp.core.fingerprint import full_hash, quick_fingerprint
+from dp.core.password_manager import PasswordManager
+from dp.core.mapping_manager import MappingManager
+from dp.core.webdav import decode_shard, encode_shard, shard_id
+
+FORMATS = ('zipcrypto', 'aes', '7z', 'tar.gz')
+ENCRYPTED = ('zipcrypto', 'aes', '7z')
+GROUPS = ('detect', 'mapping', 'trial', 'crack', 'extract', 'sync')
+SUFFIXES = {'zipcrypto': '.zip', 'aes': '.zip', '7z': '.7z', 'tar.gz': '.tar.gz'}
+PASSWORD = 'bench-password'
+# 合成密码本的最大条数
+MAX_BOOK = 1000000
+# ZipCrypto 由纯 Python 加密生成，大于此值的夹具按此截断
+ZIPCRYPTO_MAX_MB = 1
+# 单项计时循环的时间上限
+SAMPLE_SECONDS = 0.5
+
+
+def _payload(size):
+    """Half random, half repetitive bytes so compressors see realistic input"""
+    random_part = os.urandom(size // 2)
+    text = b'the quick brown fox jumps over the lazy dog 0123456789\n'
+    repeated = (text * (size // len(text) + 1))[:size - len(random_part)]
+    return random_part + repeated
+
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = (c >> 1) ^ 0xEDB88320 if c & 1 else c >> 1
+        table.append(c)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+class _ZipCrypto:
+    """Traditional PKWARE encryption; pyzipper and zipfile can only decrypt it"""
+
+    def __init__(self, pwd):
+        self.keys = [0x12345678, 0x23456789, 0x34567890]
+        for b in pwd:
+            self._update(b)
+
+    def _update(self, b):
+        k0, k1, k2 = self.keys
+        k0 = _CRC_TABLE[(k0 ^ b) & 0xff] ^ (k0 >> 8)
+        k1 = ((k1 + (k0 & 0xff)) * 134775813 + 1) & 0xffffffff
+        k2 = _CRC_TABLE[(k2 ^ (k1 >> 24)) & 0xff] ^ (k2 >> 8)
+        self.keys = [k0, k1, k2]
+
+    def encrypt(self, data):
+        out = bytearray(len(data))
+        for i, b in enumerate(data):
+            t = (self.keys[2] | 2) & 0xffff
+            out[i] = b ^ (((t * (t ^ 1)) >> 8) & 0xff)
+            self._update(b)
+        return bytes(out)
+
+
+def write_zipcrypto(path, members, pwd):
+    """Write a deflated ZipCrypto zip from [(name, data)]"""
+    dos_time, dos_date = 0, (2020 - 1980) << 9 | 1 << 5 | 1
+    central = []
+    with open(path, 'wb') as f:
+        for name, data in members:
+            crc = zlib.crc32(data)
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            compressed = compressor.compress(data) + compressor.flush()
+            # 12 字节加密头，最后一字节为 CRC 高位，供解密端快速校验密码
+            header = os.urandom(11) + bytes([crc >> 24])
+            blob = _ZipCrypto(pwd.encode('utf-8')).encrypt(header + compressed)
+            raw_name = name.encode('utf-8')
+            offset = f.tell()
+            f.write(struct.pack('<4s5H3L2H', b'PK\x03\x04', 20, 0x1, 8, dos_time, dos_date,
+                                crc, len(blob), len(data), len(raw_name), 0))
+            f.write(raw_name)
+            f.write(blob)
+            central.append(struct.pack('<4s6H3L5H2L', b'PK\x01\x02', 20, 20, 0x1, 8, dos_time, dos_date,
+                                       crc, len(blob), len(data), len(raw_name), 0, 0, 0, 0, 0, offset) + raw_name)
+        start = f.tell()
+        for entry in central:
+            f.write(entry)
+        f.write(struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, len(central), len(central),
+                            f.tell() - start, start, 0))
+
+
+def make_fixture(kind, directory, size_mb):
+    """Write a synthetic archive: a small note plus a payload member of size_mb"""
+    if kind == 'zipcrypto':
+        size_mb = min(size_mb, ZIPCRYPTO_MAX_MB)
+    path = os.path.join(directory, f"{kind.replace('.', '_')}-{size_mb}m{SUFFIXES[kind]}")
+    members = [('note.txt', b'benchmark fixture\n' * 64), ('payload.bin', _payload(size_mb * 1024 * 1024))]
+    if kind == 'zipcrypto':
+        write_zipcrypto(path, members, PASSWORD)
+    elif kind == 'aes':
+        import pyzipper
+        with pyzipper.AESZipFile(path, 'w', compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES) as zf:
+            zf.setpassword(PASSWORD.encode('utf-8'))
+            for name, data in members:
+                zf.writestr(name, data)
+    elif kind == '7z':
+        import py7zr
+        with py7zr.SevenZipFile(path, 'w', password=PASSWORD) as archive:
+            for name, data in members:
+                archive.writestr(data, name)
+    else:
+        import tarfile
+        with tarfile.open(path, 'w:gz') as tf:
+            for name, data in members:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+    return path, size_mb
+
+
+def _repeat(func, limit=SAMPLE_SECONDS, at_most=100000):
+    """Call func until the time limit; returns seconds per call"""
+    count = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= limit or count >= at_most:
+            return elapsed / count
+
+
+def _book(size, rank):
+    book = [f"pw{i:07d}" for i in range(size)]
+    book[rank - 1] = PASSWORD
+    return book
+
+
+def _bench_fixtures(fixtures, rows):
+    extractor = Extractor()
+    for kind, size_mb, path in fixtures:
+        case = f"{kind} {size_mb}MiB"
+        rows.append(('detect', case, _repeat(lambda: Extractor.detect_type(path)) * 1e6, 'us'))
+        rows.append(('mapping', f"{case} quick", _repeat(lambda: quick_fingerprint(path)) * 1e6, 'us'))
+        seconds = _repeat(lambda: full_hash(path), at_most=3)
+        rows.append(('mapping', f"{case} full", os.path.getsize(path) / seconds / 2 ** 20, 'MiB/s'))
+        with extractor.open_session(path) as session:
+            out = tempfile.mkdtemp(dir=os.path.dirname(path))
+            start = time.perf_counter()
+            session.extract_all(out, PASSWORD if kind in ENCRYPTED else None, progress=False)
+            seconds = time.perf_counter() - start
+            shutil.rmtree(out)
+        rows.append(('extract', case, size_mb / seconds, 'MiB/s'))
+
+
+def _bench_trials(fixtures, book_size, ranks, max_seconds, workers, rows):
+    """Per-password cost, then crack time with the right password at each rank of the book"""
+    extractor = Extractor()
+    cracker = PasswordCracker(workers)
+    seen = set()
+    for kind, size_mb, path in fixtures:
+        if kind not in ENCRYPTED or kind in seen:
+            continue
+        seen.add(kind)
+        wrong = (f"wrong{i}" for i in itertools.count())
+        with extractor.open_session(path) as session:
+            per_trial = _repeat(lambda: session.try_password(next(wrong)), at_most=book_size)
+            rows.append(('trial', kind, per_trial * 1000, 'ms'))
+            for rank in ranks:
+                if rank > book_size:
+                    continue
+                estimate = rank * per_trial / cracker.workers
+                if estimate > max_seconds:
+                    rows.append(('crack', f"{kind} rank {rank}/{book_size}", estimate, 's (estimated)'))
+                    continue
+                result = cracker.crack(session, _book(book_size, rank))
+                if not result.found:
+                    raise RuntimeError(f"Benchmark password not found in {path}")
+                rows.append(('crack', f"{kind} rank {rank}/{book_size}", result.elapsed, 's'))
+
+
+def _bench_sync(directory, entries, rows):
+    """Shard encode/decode and local merge of entries passwords and mappings, as a pull applies them"""
+    passwords = [f"pw{i:07d}" for i in range(entries)]
+    mappings = {f"fp1:{hashlib.sha256(p.encode()).hexdigest()}": p for p in passwords}
+    start = time.perf_counter()
+    shards = {}
+    for password in passwords:
+        shards.setdefault(shard_id('passwords', password), set()).add(password)
+    for key, password in mappings.items():
+        shards.setdefault(shard_id('mappings', key), {})[key] = password
+    encoded = {shard: encode_shard(shard, items) for shard, items in shards.items()}
+    rows.append(('sync', f"encode {entries}", time.perf_counter() - start, 's'))
+
+    start = time.perf_counter()
+    decoded = {shard: decode_shard(shard, blob) for shard, (_, blob) in encoded.items()}
+    rows.append(('sync', f"decode {entries}", time.perf_counter() - start, 's'))
+
+    pm = PasswordManager(os.path.join(directory, 'passwords.txt'))
+    mm = MappingManager(os.path.join(directory, 'mappings.json'), os.path.join(directory, 'fingerprints.json'))
+    start = time.perf_counter()
+    for shard, items in decoded.items():
+        if shard.startswith('passwords/'):
+            pm.merge(items, track=False)
+        else:
+            mm.update(items, track=False)
+    rows.append(('sync', f"merge {entries}", time.perf_counter() - start, 's'))
+
+
+def run_benchmarks(sizes=(1, 16), book_size=10000, ranks=(1, 100, 1000), max_seconds=30, workers=0, formats=FORMATS):
+    """Generate fixtures in a temporary directory and time every phase; returns [(group, case, value, unit)]"""
+    rows = []
+    directory = tempfile.mkdtemp(prefix='dp-bench-')
+    try:
+        fixtures = []
+        for kind in formats:
+            for size_mb in sizes:
+                path, size_mb = make_fixture(kind, directory, size_mb)
+                if all(path != p for _, _, p in fixtures):
+                    fixtures.append((kind, size_mb, path))
+        _bench_fixtures(fixtures, rows)
+        _bench_trials(fixtures, book_size, ranks, max_seconds, workers, rows)
+        _bench_sync(directory, book_size, rows)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return sorted(rows, key=lambda row: GROUPS.index(row[0]))
@@ -0,0 +1,88 @@
+﻿import os
+import re
+from dp.core.extractor import Extractor
+
+# 明确标注密码的写法，如 pw-abc123、password: abc、解压码：abc
+MARKER = re.compile(
+    r'(?<![A-Za-z0-9])(?:password|passwd|pass|pwd|pw|解压密码|解压码|提取码|密码)\s*[:：=_\-]?\s*([^\s,;，；、]+)',
+    re.IGNORECASE)
+SEPARATORS = re.compile(r'[\s_\-.,;:=+()\[\]{}【】（）「」，；：]+')
+MIN_TOKEN = 3
+MAX_TOKEN = 64
+# 每个归档最多生成的候选数；7z/RAR5 每次尝试都要跑一遍密钥派生，不宜太多
+MAX_CANDIDATES = 64
+SIDECAR_MAX_SIZE = 64 * 1024
+# 除 <归档名>.txt 外，同目录下常见的写着密码的文件
+SIDECAR_NAMES = ('password.txt', 'passwd.txt', 'pw.txt', '密码.txt', '解压密码.txt', 'readme.txt')
+
+# 变形规则，可在配置 candidate_rules 中按名字选用
+RULES = {
+    'strip': lambda s: s.strip('\'"`<>()[]{}【】（）「」'),
+    'lower': str.lower,
+    'upper': str.upper,
+    'capitalize': str.capitalize,
+    'reverse': lambda s: s[::-1],
+}
+DEFAULT_RULES = ('strip', 'lower')
+
+
+def _decode(data):
+    if isinstance(data, str):
+        return data
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        # 中文环境下打包的注释和文本多为 GBK
+        return data.decode('gbk', errors='replace')
+
+
+def tokens_from_text(text, lines=False):
+    """Split text into (marked, loose) tokens: explicitly labelled passwords, then lines and words"""
+    marked = []
+    for match in MARKER.finditer(text):
+        value = match.group(1)
+        # pw-abc123_v2 这类写法也试一下第一个分隔符之前的部分
+        marked += [value, SEPARATORS.split(value)[0]]
+    loose = [line.strip() for line in text.splitlines()] if lines else []
+    loose += SEPARATORS.split(text)
+    keep = lambda tokens: [t for t in tokens if MIN_TOKEN <= len(t) <= MAX_TOKEN]
+    return keep(marked), keep(loose)
+
+
+def sidecar_texts(file_path):
+    """Contents of small text files next to the archive that may carry its password"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    stem = Extractor.strip_extension(os.path.basename(file_path))
+    texts = []
+    for name in dict.fromkeys((stem + '.txt',) + SIDECAR_NAMES):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.isfile(path) and os.path.getsize(path) <= SIDECAR_MAX_SIZE:
+                with open(path, 'rb') as f:
+                    texts.append(_decode(f.read()))
+        except OSError:
+            continue
+    return texts
+
+
+def hint_candidates(file_path, comment=None, rules=DEFAULT_RULES, sidecars=True):
+    """Password candidates from the archive comment, sidecar text files and the file name"""
+    sources = []
+    if comment:
+        sources.append((_decode(comment), True))
+    if sidecars:
+        sources += [(text, True) for text in sidecar_texts(file_path)]
+    sources.append((Extractor.strip_extension(os.path.basename(file_path)), True))
+
+    marked, loose = [], []
+    for text, lines in sources:
+        m, l = tokens_from_text(text, lines)
+        marked += m
+        loose += l
+    mutations = [RULES[name] for name in rules if name in RULES]
+    candidates = []
+    for token in marked + loose:
+        candidates.append(token)
+        candidates += [mutate(token) for mutate in mutations]
+    candidates = [c for c in dict.fromkeys(candidates) if c]
+    return candidates[:MAX_CANDIDATES]
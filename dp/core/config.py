@@ -1,6 +1,5 @@
 ﻿import configparser
 import os
-import keyring
 
 class ConfigManager:
     def __init__(self, config_path='data/config.ini'):
@@ -17,11 +16,21 @@ class ConfigManager:
         self.config['webdav'] = {
             'url': '',
             'username': '',
-            'sync_interval': '10'
+            'sync_interval': '10',
+            'state_file': 'data/sync_state.json'
         }
         self.config['local'] = {
             'password_file': 'data/passwords.txt',
-            'mapping_file': 'data/mappings.json'
+            'mapping_file': 'data/mappings.json',
+            'stats_file': 'data/password_stats.json',
+            'fingerprint_cache': 'data/fingerprints.json',
+            'index_cache': 'data/index_cache.json',
+            'watch_state': 'data/watch_state.json',
+            'workers': '0',
+            'candidate_rules': 'strip,lower',
+            'nested_max_depth': '5',
+            'nested_max_size_mb': '16384',
+            'trace_file': ''
         }
         os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
         with open(self.config_path, 'w') as f:
@@ -31,12 +40,15 @@ class ConfigManager:
         """Retrieve WebDAV config, excluding password (stored in keyring)"""
         url = self.config['webdav']['url']
         username = self.config['webdav']['username']
+        # keyring 后端加载较慢，只在需要 WebDAV 配置时导入
+        import keyring
         password = keyring.get_password('webdav', username)
         return {
             'url': url,
             'username': username,
             'password': password,
-            'sync_interval': int(self.config['webdav'].get('sync_interval', '10'))
+            'sync_interval': int(self.config['webdav'].get('sync_interval', '10')),
+            'state_file': self.config['webdav'].get('state_file', 'data/sync_state.json')
         }
 
     def update_webdav_config(self, url, username, password):
@@ -44,6 +56,7 @@ class ConfigManager:
         self.config['webdav']['url'] = url
         self.config['webdav']['username'] = username
         # Save password securely in keyring
+        import keyring
         keyring.set_password('webdav', username, password)
         with open(self.config_path, 'w') as f:
             self.config.write(f)
@@ -51,5 +64,14 @@ class ConfigManager:
     def get_local_config(self):
         return {
             'password_file': self.config['local']['password_file'],
-            'mapping_file': self.config['local']['mapping_file']
+            'mapping_file': self.config['local']['mapping_file'],
+            'stats_file': self.config['local'].get('stats_file', 'data/password_stats.json'),
+            'fingerprint_cache': self.config['local'].get('fingerprint_cache', 'data/fingerprints.json'),
+            'index_cache': self.config['local'].get('index_cache', 'data/index_cache.json'),
+            'watch_state': self.config['local'].get('watch_state', 'data/watch_state.json'),
+            'workers': int(self.config['local'].get('workers', '0')),
+            'candidate_rules': [r.strip() for r in self.config['local'].get('candidate_rules', 'strip,lower').split(',') if r.strip()],
+            'nested_max_depth': int(self.config['local'].get('nested_max_depth', '5')),
+            'nested_max_size_mb': int(self.config['local'].get('nested_max_size_mb', '16384')),
+            'trace_file': self.config['local'].get('trace_file', '')
         }
@@ -0,0 +1,97 @@
+﻿import math
+import multiprocessing
+import os
+import time
+from dp.core.extractor import Extractor
+
+# 先在当前进程里串行尝试的候选数，命中率最高的通常就在这里，省去启动进程池的开销
+SERIAL_HEAD = 16
+# 每个进程平均分到的块数：块越小负载越均衡，命中后停下也越快
+CHUNKS_PER_WORKER = 4
+# 块大小下限，避免每个候选都走一次进程间通信
+MIN_CHUNK = 4
+
+_session = None
+_found = None
+
+
+def _init_worker(file_path, found):
+    global _session, _found
+    _session = Extractor().open_session(file_path)
+    _found = found
+
+
+def _try_chunk(job):
+    offset, chunk = job
+    attempts = 0
+    for pwd in chunk:
+        if _found.is_set():
+            break
+        attempts += 1
+        if _session.try_password(pwd):
+            _found.set()
+            return offset, attempts, True
+    return offset, attempts, False
+
+
+class CrackResult:
+    def __init__(self, password, found, attempts, elapsed, remaining=()):
+        self.password = password
+        self.found = found
+        self.attempts = attempts
+        self.elapsed = elapsed
+        # 尚未尝试的候选（保持原顺序）；密码校验通过但解压失败时从这里继续
+        self.remaining = remaining
+
+    @property
+    def rate(self):
+        return self.attempts / self.elapsed if self.elapsed else 0.0
+
+
+class PasswordCracker:
+    def __init__(self, workers=0):
+        self.workers = workers or os.cpu_count() or 1
+
+    def crack(self, session, passwords):
+        """Find the password of an open ArchiveSession, sharding candidates across processes.
+
+        To look past a password that verifies but then fails to extract, crack
+        the result's remaining candidates.
+        """
+        start = time.perf_counter()
+        attempts = 0
+        # 从文件对象打开的内层归档无法在子进程里重新打开，只能串行
+        serial = self.workers <= 1 or not isinstance(session.file_path, str)
+        head = passwords if serial else passwords[:SERIAL_HEAD]
+        for i, pwd in enumerate(head):
+            attempts += 1
+            if session.try_password(pwd):
+                return CrackResult(pwd, True, attempts, time.perf_counter() - start, passwords[i + 1:])
+
+        rest = passwords[len(head):]
+        if not rest:
+            return CrackResult(None, False, attempts, time.perf_counter() - start)
+        password, found, more, remaining = self._crack_parallel(session.file_path, rest)
+        return CrackResult(password, found, attempts + more, time.perf_counter() - start, remaining)
+
+    def _crack_parallel(self, file_path, passwords):
+        # 按顺序切块分发，靠前的候选先被尝试；任一进程命中后其余进程立即停止
+        # 块大小随候选数和进程数变化，保证每个进程都有活可干
+        size = max(MIN_CHUNK, math.ceil(len(passwords) / (self.workers * CHUNKS_PER_WORKER)))
+        chunks = [(i, passwords[i:i + size]) for i in range(0, len(passwords), size)]
+        found = multiprocessing.Event()
+        attempts = 0
+        tried = {}
+        pool = multiprocessing.Pool(min(self.workers, len(chunks)), _init_worker, (file_path, found))
+        try:
+            for offset, count, hit in pool.imap_unordered(_try_chunk, chunks):
+                attempts += count
+                tried[offset] = count
+                if hit:
+                    # 没有回报的块按未尝试处理，宁可重试几个也不漏掉
+                    remaining = [p for i, chunk in chunks for p in chunk[tried.get(i, 0):]]
+                    return passwords[offset + count - 1], True, attempts, remaining
+            return None, False, attempts, []
+        finally:
+            pool.terminate()
+            pool.join()
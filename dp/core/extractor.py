@@ -1,64 +1,256 @@
-﻿import os
-import pyzipper
-import py7zr
-import rarfile
-import tarfile
-from tqdm import tqdm
+﻿import io
+import os
+import tempfile
+from dp.core.archive_session import READ_CHUNK, member_path, ZipSession, SevenZipSession, RarSession, TarSession, ZstdTarSession
+
+SESSIONS = {
+    'zip': ZipSession,
+    '7z': SevenZipSession,
+    'rar': RarSession,
+    'tar': TarSession,
+    'gz': TarSession,
+    'bz2': TarSession,
+    'xz': TarSession,
+    'zst': ZstdTarSession,
+}
+
+# 一次读取的文件头大小，足以覆盖 ustar 位于 257 字节处的标记
+HEADER_SIZE = 512
+
+# (偏移, 魔数, 类型)，按顺序匹配
+SIGNATURES = [
+    (0, b'PK\x03\x04', 'zip'),
+    (0, b'PK\x05\x06', 'zip'),  # 空 zip
+    (0, b"7z\xbc\xaf\x27\x1c", '7z'),
+    (0, b'Rar!\x1a\x07', 'rar'),
+    (0, b'\x1f\x8b', 'gz'),
+    (0, b'BZh', 'bz2'),
+    (0, b'\xfd7zXZ\x00', 'xz'),
+    (0, b'\x28\xb5\x2f\xfd', 'zst'),
+    (257, b'ustar', 'tar'),
+]
+
+# 没有可识别的文件头时按扩展名判断，复合扩展名放在前面
+EXTENSIONS = [
+    ('.tar.gz', 'gz'), ('.tgz', 'gz'),
+    ('.tar.bz2', 'bz2'), ('.tbz2', 'bz2'), ('.tbz', 'bz2'),
+    ('.tar.xz', 'xz'), ('.txz', 'xz'),
+    ('.tar.zst', 'zst'), ('.tzst', 'zst'),
+    ('.zip', 'zip'), ('.7z', '7z'), ('.rar', 'rar'), ('.tar', 'tar'),
+    ('.gz', 'gz'), ('.bz2', 'bz2'), ('.xz', 'xz'), ('.zst', 'zst'),
+]
+
+# 嵌套解压的默认限制，防止解压炸弹：最多展开的层数、所有层写出的总字节数
+NESTED_MAX_DEPTH = 5
+NESTED_MAX_SIZE = 16 * 1024 ** 3
+# 需要随机读取的内层归档在内存中缓冲，超过此大小转存临时文件
+SPOOL_MEMORY = 64 * 1024 * 1024
+
+
+class ExtractionLimitError(ValueError):
+    """Nested extraction went over its size budget"""
+
+
+def _sniff(stream):
+    """Return (header, stream) without consuming the header from the returned stream"""
+    if not hasattr(stream, 'peek'):
+        if stream.seekable():
+            header = stream.read(HEADER_SIZE)
+            stream.seek(0)
+            return header, stream
+        stream = io.BufferedReader(stream, READ_CHUNK)
+    return stream.peek(HEADER_SIZE)[:HEADER_SIZE], stream
+
+
+class _Replay(io.RawIOBase):
+    """Read-once stream that remembers what it served until commit(), so it can be replayed"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._log = bytearray()
+        self._offset = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._offset is not None and self._offset < len(self._log):
+            data = self._log[self._offset:self._offset + len(b)]
+            self._offset += len(data)
+        else:
+            data = self._stream.read(len(b))
+            if self._offset is None and self._log is not None:
+                self._log += data
+        b[:len(data)] = data
+        return len(data)
+
+    def commit(self):
+        self._log = None
+
+    def rewind(self):
+        self._offset = 0
+
+
+class _NestedExtraction:
+    """One recursive extraction: per-layer password discovery under a depth and size budget"""
+
+    def __init__(self, discover, max_depth, max_size):
+        self.discover = discover
+        self.max_depth = max_depth
+        self.left = max_size
+        self.expanded = 0
+
+    def run(self, session, pwd, output_dir, depth=1):
+        session.walk(pwd, lambda name, stream: self._member(name, stream, output_dir, depth))
+
+    def _member(self, name, stream, output_dir, depth):
+        target = member_path(output_dir, name)
+        if depth < self.max_depth:
+            header, stream = _sniff(stream)
+            file_type = Extractor.detect_header(header, name)
+            if file_type in SESSIONS:
+                self._archive(SESSIONS[file_type], name, stream, target, depth + 1)
+                return
+        # 超过层数限制的内层归档原样保存
+        self._store(stream, target)
+
+    def _archive(self, cls, name, stream, target, depth):
+        output_dir = Extractor.strip_extension(target)
+        if cls.SOURCE == 'stream':
+            # tar 系列只需顺序读取，直接从外层成员流解压，不经过中间文件
+            source = _Replay(stream)
+            if self._expand(cls, name, source, output_dir, depth, source.commit):
+                return
+            source.rewind()
+            self._store(source, target)
+            return
+
+        if cls.SOURCE == 'path':
+            with tempfile.NamedTemporaryFile(suffix=os.path.splitext(name)[1], delete=False) as spool:
+                self._copy(stream, spool)
+            try:
+                if not self._expand(cls, name, spool.name, output_dir, depth):
+                    with open(spool.name, 'rb') as f:
+                        self._store(f, target)
+            finally:
+                os.remove(spool.name)
+            return
+
+        with tempfile.SpooledTemporaryFile(SPOOL_MEMORY) as spool:
+            self._copy(stream, spool)
+            spool.seek(0)
+            if not self._expand(cls, name, spool, output_dir, depth):
+                spool.seek(0)
+                self._store(spool, target)
+
+    def _expand(self, cls, name, source, output_dir, depth, opened=None):
+        """Open and extract an inner archive; False if it cannot be opened or no password fits"""
+        try:
+            session = cls(source)
+        except Exception:
+            # 只是文件头像归档，按普通文件保存
+            return False
+        with session:
+            for pwd in self.discover(session, name):
+                if opened:
+                    # 流式来源提交后无法倒回，不能换密码重试
+                    opened()
+                    self.run(session, pwd, output_dir, depth)
+                    break
+                try:
+                    self.run(session, pwd, output_dir, depth)
+                    break
+                except ExtractionLimitError:
+                    raise
+                except Exception:
+                    # 校验通过但解压失败，换下一个通过校验的密码
+                    continue
+            else:
+                return False
+            self.expanded += 1
+        return True
+
+    def _store(self, stream, target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as out:
+            self._copy(stream, out)
+
+    def _copy(self, src, dst):
+        while True:
+            chunk = src.read(READ_CHUNK)
+            if not chunk:
+                return
+            self.left -= len(chunk)
+            if self.left < 0:
+                raise ExtractionLimitError("Nested extraction exceeds the size limit")
+            dst.write(chunk)
+
 
 class Extractor:
     @staticmethod
     def detect_type(file_path):
-        signature = open(file_path, 'rb').read(4)
-        if signature.startswith(b'PK'):
-            return 'zip'
-        elif signature.startswith(b'7z'):
-            return '7z'
-        elif signature.startswith(b'Rar'):
-            return 'rar'
-        elif signature.startswith(b'\x1f\x8b'):
-            return 'tar.gz'
-        return os.path.splitext(file_path)[1][1:]
+        with open(file_path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        return Extractor.detect_header(header, file_path)
 
-    def extract(self, file_path, output_dir=None, password=None):
+    @staticmethod
+    def detect_header(header, name):
+        """Match a header block against SIGNATURES, falling back to the extension of name"""
+        for offset, magic, file_type in SIGNATURES:
+            if header.startswith(magic, offset):
+                return file_type
+        lower = name.lower()
+        for ext, file_type in EXTENSIONS:
+            if lower.endswith(ext):
+                return file_type
+        return os.path.splitext(name)[1][1:]
+
+    @staticmethod
+    def strip_extension(file_path):
+        """Drop the archive extension, including compound ones like .tar.gz"""
+        name = file_path.lower()
+        for ext, _ in EXTENSIONS:
+            if name.endswith(ext):
+                return file_path[:-len(ext)]
+        return os.path.splitext(file_path)[0]
+
+    @staticmethod
+    def is_archive(file_path):
+        return Extractor.detect_type(file_path) in SESSIONS
+
+    def open_session(self, file_path):
+        """Open an archive once for repeated password trials"""
         file_type = self.detect_type(file_path)
-        output_dir = output_dir or os.path.splitext(file_path)[0]
+        if file_type not in SESSIONS:
+            raise ValueError("Unsupported file format")
+        return SESSIONS[file_type](file_path)
+
+    def check_password(self, file_path, password=None):
+        """Verify a password without writing anything to disk"""
+        try:
+            with self.open_session(file_path) as session:
+                return session.try_password(password)
+        except Exception:
+            return False
+
+    def extract(self, file_path, output_dir=None, password=None):
+        output_dir = output_dir or self.strip_extension(file_path)
         os.makedirs(output_dir, exist_ok=True)
 
         try:
-            if file_type == 'zip':
-                self._extract_zip(file_path, output_dir, password)
-            elif file_type == '7z':
-                self._extract_7z(file_path, output_dir, password)
-            elif file_type == 'rar':
-                self._extract_rar(file_path, output_dir, password)
-            elif file_type in ['tar', 'gz', 'bz2']:
-                self._extract_tar(file_path, output_dir)
-            else:
-                raise ValueError("Unsupported file format")
+            with self.open_session(file_path) as session:
+                session.extract_all(output_dir, password)
             return True
-        except Exception as e:
+        except Exception:
             return False
 
-    def _extract_zip(self, path, output, pwd):
-        with pyzipper.AESZipFile(path) as zf:
-            if pwd:
-                zf.setpassword(pwd.encode('utf-8'))
-            total = sum(f.file_size for f in zf.infolist())
-            with tqdm(total=total, unit='B', unit_scale=True) as pbar:
-                for f in zf.infolist():
-                    zf.extract(f, output)
-                    pbar.update(f.file_size)
-
-    def _extract_7z(self, path, output, pwd):
-        with py7zr.SevenZipFile(path, 'r', password=pwd) as z:
-            z.extractall(output)
-
-    def _extract_rar(self, path, output, pwd):
-        with rarfile.RarFile(path) as rf:
-            if pwd:
-                rf.setpassword(pwd)
-            rf.extractall(output)
-
-    def _extract_tar(self, path, output):
-        with tarfile.open(path) as tf:
-            tf.extractall(output)
\ No newline at end of file
+    def extract_nested(self, session, output_dir, pwd, discover,
+                       max_depth=NESTED_MAX_DEPTH, max_size=NESTED_MAX_SIZE):
+        """Extract an open session and every archive inside it, returning how many inner archives were expanded.
+
+        discover(session, name) yields the passwords that verify against an inner archive, best
+        first; the next one is used when extracting with the previous one fails.
+        """
+        nested = _NestedExtraction(discover, max_depth, max_size)
+        nested.run(session, pwd, output_dir)
+        return nested.expanded
\ No newline at end of file
@@ -0,0 +1,174 @@
+﻿import hashlib
+import json
+import os
+import struct
+import threading
+
+BLOCK_SIZE = 64 * 1024
+HASH_CHUNK = 1024 * 1024
+# zip 中央目录超过此大小时不再纳入指纹
+MAX_CENTRAL_DIR = 16 * 1024 * 1024
+FINGERPRINT_VERSION = 'fp1'
+# 日志条数超过 max(COMPACT_MIN, 缓存条数 * COMPACT_RATIO) 时合并回缓存文件
+COMPACT_MIN = 1000
+COMPACT_RATIO = 0.25
+# 缓存的文件数上限，合并时丢弃最久未更新的
+MAX_ENTRIES = 100000
+
+
+def full_hash(file_path):
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def quick_fingerprint(file_path):
+    """Fingerprint from size, head/tail blocks and the zip central directory
+
+    The 7z start header (with the CRC of the whole index) sits in the head
+    block and the RAR end-of-archive records in the tail block, so only zip
+    needs its index read separately.
+    """
+    size = os.path.getsize(file_path)
+    hasher = hashlib.sha256(str(size).encode())
+    with open(file_path, 'rb') as f:
+        hasher.update(f.read(BLOCK_SIZE))
+        if size > BLOCK_SIZE:
+            f.seek(max(BLOCK_SIZE, size - BLOCK_SIZE))
+            tail = f.read(BLOCK_SIZE)
+            hasher.update(tail)
+            hasher.update(_zip_central_directory(f, tail, size))
+    return f"{FINGERPRINT_VERSION}:{hasher.hexdigest()}"
+
+
+def _zip_central_directory(f, tail, size):
+    # 中央目录包含每个成员的 CRC 和大小
+    pos = tail.rfind(b'PK\x05\x06')
+    if pos < 0 or len(tail) - pos < 22:
+        return b''
+    cd_size, cd_offset = struct.unpack('<II', tail[pos + 12:pos + 20])
+    if cd_size > MAX_CENTRAL_DIR or cd_offset + cd_size > size:
+        return b''
+    f.seek(cd_offset)
+    return f.read(cd_size)
+
+
+class FingerprintCache:
+    """Persistent (path, inode, size, mtime) -> fingerprint cache
+
+    New results are appended to a log; the log is folded into the cache file
+    with an atomic replace once it grows, dropping entries for files that
+    are gone or changed.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.log_path = file_path + '.log' if file_path else None
+        self.entries = {}
+        self.ties = set()
+        self.lock = threading.RLock()
+        self._log_size = 0
+        self._load()
+
+    def _load(self):
+        if self.file_path and os.path.exists(self.file_path):
+            try:
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.entries = data.get('entries', {})
+                self.ties = set(data.get('ties', []))
+            except (OSError, ValueError, AttributeError):
+                # 缓存损坏时当作空缓存，指纹会按需重新计算
+                self.entries, self.ties = {}, set()
+        if self.log_path and os.path.exists(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        if record[0] == 'tie':
+                            self.ties.add(record[1])
+                        else:
+                            self.entries.pop(record[1], None)
+                            self.entries[record[1]] = record[2]
+                    except (ValueError, IndexError, TypeError):
+                        # 崩溃时写了一半的行
+                        continue
+                    self._log_size += 1
+        if self._needs_compaction():
+            self.compact()
+
+    def _needs_compaction(self):
+        return self._log_size > max(COMPACT_MIN, len(self.entries) * COMPACT_RATIO)
+
+    def _log(self, record):
+        """Append one record; called with the lock held"""
+        if not self.log_path:
+            return
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        self._log_size += 1
+        if self._needs_compaction():
+            self.compact()
+
+    def _fresh(self, key, entry):
+        try:
+            st = os.stat(key)
+        except OSError:
+            return False
+        return entry['stat'] == [st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def compact(self):
+        """Drop stale entries and fold the log into the cache file with an atomic replace"""
+        with self.lock:
+            if not self.file_path:
+                return
+            entries = {k: v for k, v in self.entries.items() if self._fresh(k, v)}
+            # 超出上限时丢弃最久未更新的
+            self.entries = dict(list(entries.items())[-MAX_ENTRIES:])
+            tmp_path = self.file_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'entries': self.entries, 'ties': sorted(self.ties)}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.file_path)
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self._log_size = 0
+
+    def _lookup(self, file_path):
+        st = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        stamp = [st.st_ino, st.st_size, st.st_mtime_ns]
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry['stat'] == stamp:
+                return entry
+            entry = {'stat': stamp}
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+            return entry
+
+    def _cached(self, file_path, kind, compute):
+        entry = self._lookup(file_path)
+        if kind not in entry:
+            # 哈希计算不持锁，多个批处理线程可并行读取不同文件
+            value = compute(file_path)
+            key = os.path.abspath(file_path)
+            with self.lock:
+                entry[kind] = value
+                self._log(['entry', key, entry])
+        return entry[kind]
+
+    def fingerprint(self, file_path):
+        return self._cached(file_path, 'quick', quick_fingerprint)
+
+    def full_hash(self, file_path):
+        return self._cached(file_path, 'full', full_hash)
+
+    def mark_tie(self, fingerprint):
+        with self.lock:
+            if fingerprint not in self.ties:
+                self.ties.add(fingerprint)
+                self._log(['tie', fingerprint])
@@ -0,0 +1,47 @@
+﻿import json
+import os
+import threading
+from dp.core.archive_session import MemberInfo
+
+# 最多缓存的归档数，超出后丢弃最早加入的
+MAX_ENTRIES = 1000
+
+
+class IndexCache:
+    """Persistent fingerprint -> member listing cache, so listing a known archive reads nothing"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if self.file_path and os.path.exists(self.file_path):
+            try:
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                # 缓存损坏时当作空缓存
+                self.entries = {}
+
+    def _save(self):
+        if not self.file_path:
+            return
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.file_path)
+
+    def get(self, fingerprint):
+        with self.lock:
+            rows = self.entries.get(fingerprint)
+        return [MemberInfo(*row) for row in rows] if rows is not None else None
+
+    def put(self, fingerprint, members):
+        with self.lock:
+            self.entries.pop(fingerprint, None)
+            self.entries[fingerprint] = [m.to_list() for m in members]
+            while len(self.entries) > MAX_ENTRIES:
+                del self.entries[next(iter(self.entries))]
+            self._save()
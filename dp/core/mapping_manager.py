@@ -1,34 +1,160 @@
-﻿import hashlib
-import json
+﻿import json
 import os
+import re
+import threading
+from dp.core.fingerprint import FingerprintCache
+
+# 日志条数超过 max(COMPACT_MIN, 映射数 * COMPACT_RATIO) 时合并回映射文件
+COMPACT_MIN = 1000
+COMPACT_RATIO = 0.25
+# 升级前的映射以完整 SHA-256 为键
+LEGACY_KEY = re.compile(r'[0-9a-f]{64}')
+# 快速指纹相同时改用带此前缀的完整哈希作键，与升级前的键区分开
+TIE_PREFIX = 'full:'
 
 class MappingManager:
-    def __init__(self, file_path):
+    def __init__(self, file_path, cache_file=None):
         self.file_path = file_path
-        self.mappings = {}
-        self._load()
+        self.log_path = file_path + '.log'
+        self.outbox_path = file_path + '.outbox'
+        self.fingerprints = FingerprintCache(cache_file)
+        self.lock = threading.RLock()
+        self._mappings = None
+        self._log_size = 0
+        self._legacy = False
+
+    @property
+    def mappings(self):
+        """All mappings, loaded on first access"""
+        with self.lock:
+            if self._mappings is None:
+                self._load()
+            return self._mappings
 
     def _load(self):
+        self._mappings = {}
         if os.path.exists(self.file_path):
             with open(self.file_path, 'r', encoding='utf-8') as f:
-                self.mappings = json.load(f)
+                self._mappings = json.load(f)
+        torn = False
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        key, password = json.loads(line)
+                    except ValueError:
+                        # 崩溃时写了一半的最后一行，合并后丢弃，避免后续追加接在它后面
+                        torn = True
+                        continue
+                    self._mappings[key] = password
+                    self._log_size += 1
+        self._legacy = any(LEGACY_KEY.fullmatch(k) for k in self._mappings)
+        if torn or self._needs_compaction():
+            self.compact()
+
+    def _needs_compaction(self):
+        return self._log_size > max(COMPACT_MIN, len(self._mappings) * COMPACT_RATIO)
+
+    def update(self, mappings, track=True):
+        """Batched write: append only the changed entries to the log"""
+        with self.lock:
+            changed = [(k, v) for k, v in mappings.items() if self.mappings.get(k) != v]
+            if not changed:
+                return
+            self._mappings.update(changed)
+            self._legacy = self._legacy or any(LEGACY_KEY.fullmatch(k) for k, _ in changed)
+            lines = ''.join(json.dumps([k, v]) + '\n' for k, v in changed)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            if track:
+                # 本地新增的映射另记一份，等待作为增量推送到远端
+                with open(self.outbox_path, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+            self._log_size += len(changed)
+            if self._needs_compaction():
+                self.compact()
+
+    def compact(self):
+        """Fold the log into the mapping file with an atomic replace"""
+        with self.lock:
+            tmp_path = self.file_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.mappings, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.file_path)
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self._log_size = 0
 
-    def _save(self):
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.mappings, f, indent=2)
+    def pending(self):
+        """Local mappings not yet pushed; stay pending until clear_pending()"""
+        with self.lock:
+            sending_path = self.outbox_path + '.sending'
+            if os.path.exists(self.outbox_path):
+                with open(self.outbox_path, 'r', encoding='utf-8') as src, \
+                        open(sending_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                os.remove(self.outbox_path)
+            pending = {}
+            if os.path.exists(sending_path):
+                with open(sending_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            key, password = json.loads(line)
+                        except ValueError:
+                            continue
+                        pending[key] = password
+            return pending
+
+    def clear_pending(self):
+        with self.lock:
+            if os.path.exists(self.outbox_path + '.sending'):
+                os.remove(self.outbox_path + '.sending')
+
+    def snapshot(self):
+        """Copy of all mappings that is safe to iterate while sync merges"""
+        with self.lock:
+            return dict(self.mappings)
 
     def add(self, file_path, password):
-        file_hash = self._hash_file(file_path)
-        self.mappings[file_hash] = password
-        self._save()
+        # 指纹计算需要读文件，不在锁内进行
+        key = self.fingerprints.fingerprint(file_path)
+        existing = self.mappings.get(key)
+        if key in self.fingerprints.ties or (existing is not None and existing != password):
+            # 快速指纹相同但密码不同，改用完整哈希区分
+            self.fingerprints.mark_tie(key)
+            key = TIE_PREFIX + self.fingerprints.full_hash(file_path)
+        self.update({key: password})
 
     def get(self, file_path):
-        file_hash = self._hash_file(file_path)
-        return self.mappings.get(file_hash)
-
-    def _hash_file(self, file_path):
-        hasher = hashlib.sha256()
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(4096):
-                hasher.update(chunk)
-        return hasher.hexdigest()
\ No newline at end of file
+        key = self.fingerprints.fingerprint(file_path)
+        if key in self.fingerprints.ties:
+            password = self.mappings.get(TIE_PREFIX + self.fingerprints.full_hash(file_path))
+            if password is not None:
+                return password
+        return self.mappings.get(key)
+
+    @property
+    def has_legacy(self):
+        """True while the store holds mappings keyed by a bare full hash"""
+        with self.lock:
+            if self._mappings is None:
+                self._load()
+            return self._legacy
+
+    def get_legacy(self, file_path):
+        """Look file_path up by its full hash, as mappings were keyed before the upgrade.
+
+        Reads the whole file, so callers try this only after the cheap
+        candidates failed. A hit is re-keyed under the quick fingerprint.
+        """
+        if not self.has_legacy:
+            return None
+        # 升级前的映射（以及旧版客户端同步来的）以完整哈希为键
+        password = self.mappings.get(self.fingerprints.full_hash(file_path))
+        if password is not None:
+            self.add(file_path, password)
+        return password
\ No newline at end of file
@@ -1,29 +1,166 @@
-﻿import os
+﻿import json
+import os
+import threading
+import time
+
+# 命中记录的半衰期（天），越久未命中的密码权重越低
+HIT_HALF_LIFE_DAYS = 30
+# 同一来源目录下命中过的密码额外加权
+DIR_BIAS = 2.0
+# 日志条数超过 max(COMPACT_MIN, 密码本大小 * COMPACT_RATIO) 时合并回密码本
+COMPACT_MIN = 1000
+COMPACT_RATIO = 0.25
+
 
 class PasswordManager:
-    def __init__(self, file_path):
+    def __init__(self, file_path, stats_file=None):
         self.file_path = file_path
-        self.passwords = []
+        self.journal_path = file_path + '.journal'
+        self.outbox_path = file_path + '.outbox'
+        self.stats_file = stats_file
+        self.stats = {}
+        self._index = set()
+        self._sorted = []
+        self._dirty = False
+        self.lock = threading.RLock()
+        self._journal_size = 0
         self._load()
 
+    @property
+    def passwords(self):
+        """Sorted password list, rebuilt lazily after changes"""
+        with self.lock:
+            if self._dirty:
+                self._sorted = sorted(self._index)
+                self._dirty = False
+            return self._sorted
+
+    def __contains__(self, password):
+        return password in self._index
+
+    def __len__(self):
+        return len(self._index)
+
     def _load(self):
         if os.path.exists(self.file_path):
             with open(self.file_path, 'r', encoding='utf-8') as f:
-                self.passwords = sorted({line.strip() for line in f if line.strip()})
-        self._save()
+                self._index = {line.strip() for line in f if line.strip()}
+        base_size = len(self._index)
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._index.add(line.strip())
+                        self._journal_size += 1
+        self._dirty = True
+        if self._needs_compaction(base_size):
+            self.compact()
+        if self.stats_file and os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    self.stats = json.load(f)
+            except (OSError, ValueError):
+                # 统计文件损坏只影响排序，从空统计重新积累
+                self.stats = {}
+
+    def _needs_compaction(self, base_size=None):
+        if base_size is None:
+            base_size = len(self._index) - self._journal_size
+        return self._journal_size > max(COMPACT_MIN, base_size * COMPACT_RATIO)
+
+    def _append(self, passwords, track=True):
+        """Append new passwords to the journal instead of rewriting the book"""
+        with self.lock:
+            new = list(dict.fromkeys(p for p in passwords if p and p not in self._index))
+            if not new:
+                return
+            self._index.update(new)
+            self._dirty = True
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(p + '\n' for p in new))
+            if track:
+                # 本地新增的密码另记一份，等待作为增量推送到远端
+                with open(self.outbox_path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(p + '\n' for p in new))
+            self._journal_size += len(new)
+            if self._needs_compaction():
+                self.compact()
+
+    def compact(self):
+        """Fold the journal into the sorted book with an atomic replace"""
+        with self.lock:
+            tmp_path = self.file_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self.passwords))
+            os.replace(tmp_path, self.file_path)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._journal_size = 0
 
-    def _save(self):
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(self.passwords))
+    def _save_stats(self):
+        if not self.stats_file:
+            return
+        tmp_path = self.stats_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats, f, indent=2)
+        os.replace(tmp_path, self.stats_file)
 
     def add(self, password):
-        if password not in self.passwords:
-            self.passwords.append(password)
-            self.passwords.sort()
-            self._save()
-
-    def merge(self, passwords):
-        merged = list(set(self.passwords + passwords))
-        merged.sort()
-        self.passwords = merged
-        self._save()
\ No newline at end of file
+        self._append([password])
+
+    def merge(self, passwords, track=True):
+        self._append([p.strip() for p in passwords], track)
+
+    def pending(self):
+        """Local passwords not yet pushed; stay pending until clear_pending()"""
+        with self.lock:
+            sending_path = self.outbox_path + '.sending'
+            if os.path.exists(self.outbox_path):
+                with open(self.outbox_path, 'r', encoding='utf-8') as src, \
+                        open(sending_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                os.remove(self.outbox_path)
+            if not os.path.exists(sending_path):
+                return []
+            with open(sending_path, 'r', encoding='utf-8') as f:
+                return list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+    def clear_pending(self):
+        with self.lock:
+            if os.path.exists(self.outbox_path + '.sending'):
+                os.remove(self.outbox_path + '.sending')
+
+    def record_hit(self, password, source_dir=None):
+        """Record a successful extraction with password"""
+        with self.lock:
+            entry = self.stats.setdefault(password, {'hits': 0, 'last_hit': 0, 'dirs': {}})
+            entry['hits'] += 1
+            entry['last_hit'] = time.time()
+            if source_dir:
+                entry['dirs'][source_dir] = entry['dirs'].get(source_dir, 0) + 1
+            self._save_stats()
+
+    def score(self, password, source_dir=None, now=None):
+        entry = self.stats.get(password)
+        if not entry:
+            return 0.0
+        age_days = ((now or time.time()) - entry['last_hit']) / 86400
+        score = entry['hits'] * 0.5 ** (age_days / HIT_HALF_LIFE_DAYS)
+        if source_dir:
+            score += DIR_BIAS * entry['dirs'].get(source_dir, 0)
+        return score
+
+    def hits(self, source_dir=None):
+        """Passwords that opened archives before, best score first"""
+        with self.lock:
+            now = time.time()
+            return sorted(
+                (p for p in self.stats if p in self._index),
+                key=lambda p: self.score(p, source_dir, now),
+                reverse=True
+            )
+
+    def ordered(self, source_dir=None):
+        """Passwords ordered by hit frequency/recency, never-hit ones keep alphabetical order"""
+        with self.lock:
+            return self.hits(source_dir) + [p for p in self.passwords if p not in self.stats]
\ No newline at end of file
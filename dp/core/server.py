@@ -0,0 +1,132 @@
+﻿import getpass
+import io
+import json
+import os
+import shlex
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+
+# 右键菜单等调用方的工作目录不固定，套接字放在与工作目录无关的位置
+# 可用 DP_SOCKET 环境变量统一改变 serve 和 submit 的默认位置
+DEFAULT_SOCKET = os.environ.get('DP_SOCKET') or os.path.join(tempfile.gettempdir(), f"dp-{getpass.getuser()}.sock")
+# 带取值的 dp 选项，其后的参数不是路径
+VALUE_OPTIONS = {'-j', '--jobs', '--io-jobs'}
+# 输出流末尾的结果标记，客户端据此决定退出码
+RESULT_OK = b'\x00\x01'
+RESULT_FAILED = b'\x00\x00'
+
+
+class _StreamRouter(io.TextIOBase):
+    """Route print/tqdm output of each request thread back to its own client"""
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, 'target', None) or self.default
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            args = request['args']
+        except (ValueError, KeyError) as e:
+            self.wfile.write(f"Bad request: {e}\n".encode('utf-8') + RESULT_FAILED)
+            return
+        out = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+        self.server.stdout.local.target = out
+        self.server.stderr.local.target = out
+        ok = False
+        try:
+            ok = self.server.cli.run_dp(shlex.join(args))
+        except Exception as e:
+            print(f"Error during decompression: {e}")
+        finally:
+            self.server.stdout.local.target = None
+            self.server.stderr.local.target = None
+            out.detach()
+        self.wfile.write(RESULT_OK if ok else RESULT_FAILED)
+
+
+# Windows 上没有 AF_UNIX，serve 命令会先行拒绝，这里只保证模块可以导入
+_UnixStreamServer = getattr(socketserver, 'UnixStreamServer', socketserver.BaseServer)
+
+
+class DpServer(socketserver.ThreadingMixIn, _UnixStreamServer):
+    """Long-running dp process that keeps managers, indexes and caches warm"""
+    daemon_threads = True
+
+    def __init__(self, cli, socket_path=DEFAULT_SOCKET):
+        self.cli = cli
+        self.socket_path = socket_path
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+
+    def serve(self):
+        self.stdout = _StreamRouter(sys.stdout)
+        self.stderr = _StreamRouter(sys.stderr)
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+        try:
+            self.serve_forever()
+        finally:
+            sys.stdout, sys.stderr = self.stdout.default, self.stderr.default
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def split_socket_option(args):
+    """Take --socket PATH (or --socket=PATH) off a submit command line; returns (socket_path, rest)"""
+    socket_path, rest = DEFAULT_SOCKET, []
+    it = iter(args)
+    for a in it:
+        if a == '--socket':
+            socket_path = next(it, socket_path)
+        elif a.startswith('--socket='):
+            socket_path = a.split('=', 1)[1]
+        else:
+            rest.append(a)
+    return socket_path, rest
+
+
+def submit(args, socket_path=DEFAULT_SOCKET):
+    """Thin client: send a dp job to the server and stream its output; returns False if unreachable or the job failed"""
+    # 服务端的工作目录与客户端不同，位置参数都是路径，先转成绝对路径
+    args = [
+        a if a.startswith('-') or (i and args[i - 1] in VALUE_OPTIONS) else os.path.abspath(a)
+        for i, a in enumerate(args)
+    ]
+    try:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(socket_path)
+    except OSError as e:
+        print(f"dp server is not running at {socket_path}: {e}")
+        return False
+    with conn:
+        conn.sendall(json.dumps({'args': args}).encode('utf-8') + b'\n')
+        out = sys.stdout.buffer
+        # 留住最后两个字节，流结束时它们就是结果标记
+        tail = b''
+        while chunk := conn.recv(65536):
+            tail += chunk
+            out.write(tail[:-2])
+            out.flush()
+            tail = tail[-2:]
+    if tail not in (RESULT_OK, RESULT_FAILED):
+        # 连接中断或服务端版本不带结果标记
+        out.write(tail)
+        out.flush()
+        return False
+    return tail == RESULT_OK
@@ -0,0 +1,41 @@
+﻿import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# 启动时不应加载的重量级依赖，只在真正用到对应功能时才导入
+HEAVY_MODULES = ('keyring', 'webdav3', 'py7zr', 'pyzipper', 'rarfile', 'tqdm', 'watchdog')
+# 新解释器冷启动 main.py 并执行 exit（含 DpCLI 构造和密码本加载）的时间预算
+STARTUP_BUDGET_SECONDS = 0.3
+# dp 包所在目录，子进程从这里导入
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 以 __main__ 运行 main.py exit，结束后把已加载的顶层模块写到标准错误
+_PROBE = (
+    "import os, runpy, sys\n"
+    "main = sys.argv[1]\n"
+    "sys.argv = [main, 'exit']\n"
+    "sys.path.insert(0, os.path.dirname(main))\n"
+    "try:\n"
+    "    runpy.run_path(main, run_name='__main__')\n"
+    "finally:\n"
+    "    sys.stderr.write('\\n' + ' '.join(sorted({m.split('.')[0] for m in sys.modules})))\n"
+)
+
+
+def check_startup(runs=3):
+    """Cold-start `main.py exit` in fresh interpreters; returns (best seconds, heavy modules loaded)"""
+    best, loaded = None, set()
+    main = os.path.join(_ROOT, 'main.py')
+    for _ in range(runs):
+        # 在临时目录里运行，首次启动生成的 data/ 不落在仓库中
+        with tempfile.TemporaryDirectory() as cwd:
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', _PROBE, main], cwd=cwd,
+                                 capture_output=True, text=True, check=True).stderr
+            elapsed = time.perf_counter() - start
+        # 取多次中的最快值，排除磁盘缓存未命中造成的抖动
+        best = elapsed if best is None else min(best, elapsed)
+        loaded |= set(out.splitlines()[-1].split()) & set(HEAVY_MODULES)
+    return best, sorted(loaded)
@@ -0,0 +1,68 @@
+﻿import threading
+import time
+
+# 本地变更后等待这么久再推送，期间的多次变更合并为一次
+DEBOUNCE_SECONDS = 30
+# 出错后按同步间隔指数退避，最长不超过此值
+MAX_BACKOFF_SECONDS = 3600
+
+
+class SyncScheduler:
+    """Run WebDAV sync in the background on the configured interval"""
+
+    def __init__(self, webdav, password_manager, mapping_manager, interval_minutes, tracer=None):
+        self.webdav = webdav
+        self.tracer = tracer
+        self.password_manager = password_manager
+        self.mapping_manager = mapping_manager
+        self.interval = max(interval_minutes, 1) * 60
+        self.failures = 0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._push_at = None
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def notify_change(self):
+        """Schedule a push soon; repeated calls within the debounce window collapse into one"""
+        if self._push_at is None:
+            self._push_at = time.monotonic() + DEBOUNCE_SECONDS
+            self._wakeup.set()
+
+    def _next_delay(self):
+        if self.failures:
+            return min(self.interval * 2 ** self.failures, MAX_BACKOFF_SECONDS)
+        return self.interval
+
+    def _run(self):
+        next_sync = time.monotonic() + self.interval
+        while not self._stopped.is_set():
+            due = next_sync
+            if self._push_at is not None and not self.failures:
+                due = min(due, self._push_at)
+            self._wakeup.wait(max(due - time.monotonic(), 0))
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            if time.monotonic() < due:
+                continue
+            self._push_at = None
+            trace = self.tracer.start('sync') if self.tracer else None
+            ok = self.webdav.sync(self.password_manager, self.mapping_manager, trace)
+            if trace:
+                self.tracer.finish(trace, ok)
+            if ok:
+                self.failures = 0
+            else:
+                self.failures += 1
+            next_sync = time.monotonic() + self._next_delay()
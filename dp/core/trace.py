@@ -0,0 +1,111 @@
+﻿import contextlib
+import json
+import os
+import threading
+import time
+
+# 内存中保留的最近记录数
+MAX_KEPT = 1000
+
+
+class Trace:
+    """Wall-clock time spent in each phase of one command, plus counters"""
+
+    def __init__(self, command, target=None):
+        self.command = command
+        self.target = target
+        self.started = time.time()
+        self.phases = {}
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self, ok):
+        return {
+            'command': self.command,
+            'target': self.target,
+            'time': self.started,
+            'ok': ok,
+            'total': time.perf_counter() - self._start,
+            'phases': self.phases,
+            'counters': self.counters,
+        }
+
+
+class Tracer:
+    """Keep finished traces in memory and append them to a JSON lines file when one is configured"""
+
+    def __init__(self, trace_file=None):
+        self.trace_file = trace_file
+        self.records = []
+        self.lock = threading.Lock()
+
+    def start(self, command, target=None):
+        return Trace(command, target)
+
+    def finish(self, trace, ok=True):
+        self._add(trace.to_dict(ok))
+
+    def record(self, command, target, phases, ok=True, counters=None):
+        """Add timings measured elsewhere, e.g. by the batch pipeline"""
+        self._add({
+            'command': command,
+            'target': target,
+            'time': time.time(),
+            'ok': ok,
+            'total': sum(phases.values()),
+            'phases': dict(phases),
+            'counters': dict(counters or {}),
+        })
+
+    def _add(self, record):
+        with self.lock:
+            self.records.append(record)
+            del self.records[:-MAX_KEPT]
+            if self.trace_file:
+                with open(self.trace_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+
+    def history(self):
+        """Every recorded trace: the whole trace file if configured, else this session's"""
+        with self.lock:
+            if not self.trace_file or not os.path.exists(self.trace_file):
+                return list(self.records)
+            records = []
+            with open(self.trace_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # 被中断写入的最后一行
+                        continue
+            return records
+
+
+def summarize(records):
+    """Per command: run counts, per-phase [count, total, mean, p50, max] and summed counters"""
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(record['command'], {'runs': 0, 'ok': 0, 'phases': {}, 'counters': {}})
+        entry['runs'] += 1
+        entry['ok'] += 1 if record.get('ok') else 0
+        for name, seconds in list(record['phases'].items()) + [('total', record['total'])]:
+            entry['phases'].setdefault(name, []).append(seconds)
+        for name, value in record.get('counters', {}).items():
+            entry['counters'][name] = entry['counters'].get(name, 0) + value
+    for entry in summary.values():
+        for name, values in entry['phases'].items():
+            values.sort()
+            entry['phases'][name] = [len(values), sum(values), sum(values) / len(values),
+                                     values[len(values) // 2], values[-1]]
+    return summary
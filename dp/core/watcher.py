@@ -0,0 +1,156 @@
+﻿import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dp.core.extractor import Extractor
+
+
+POLL_INTERVAL = 2.0
+# 文件大小和修改时间保持不变这么久才认为写入完成
+SETTLE_SECONDS = 3.0
+WATCH_WORKERS = 2
+
+
+def _start_observer(watcher):
+    """Start an inotify observer feeding watcher.notice, or None without watchdog"""
+    # watchdog 在真正开始监视时才导入，没有时退回到定时扫描
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class _EventHandler(FileSystemEventHandler):
+        def on_created(self, event):
+            if not event.is_directory:
+                watcher.notice(event.src_path)
+
+        def on_modified(self, event):
+            if not event.is_directory:
+                watcher.notice(event.src_path)
+
+        def on_moved(self, event):
+            if not event.is_directory:
+                watcher.notice(event.dest_path)
+
+    observer = Observer()
+    observer.schedule(_EventHandler(), watcher.directory, recursive=True)
+    observer.start()
+    return observer
+
+
+class FolderWatcher:
+    """Extract archives as they land in a directory, each one exactly once"""
+
+    def __init__(self, directory, handle, state_file=None, workers=WATCH_WORKERS):
+        self.directory = directory
+        self.handle = handle
+        self.state_file = state_file
+        self.workers = workers
+        self.handled = {}
+        self._pending = {}
+        self._queued = set()
+        self._ignored = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._load()
+        # 解压输出目录在被监视目录之内，其中的文件不再处理
+        self.output_dirs = {Extractor.strip_extension(path) for path in self.handled}
+
+    def _load(self):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.handled = json.load(f)
+
+    def _save(self):
+        if not self.state_file:
+            return
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(self.handled, f, indent=2)
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+
+    def _is_output(self, path):
+        return any(path.startswith(d + os.sep) for d in self.output_dirs)
+
+    def notice(self, path):
+        """Remember a new or growing file; it is queued once its size settles"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._queued or self._is_output(path):
+                return
+            self._pending.setdefault(path, None)
+
+    def _scan(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                self.notice(os.path.join(root, name))
+
+    def _ready(self):
+        """Pending files whose size and mtime did not change for SETTLE_SECONDS"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, seen in list(self._pending.items()):
+                try:
+                    stamp = self._stamp(path)
+                except OSError:
+                    del self._pending[path]
+                    continue
+                if self.handled.get(path) == stamp or self._ignored.get(path) == stamp:
+                    del self._pending[path]
+                elif seen is None or seen[0] != stamp:
+                    self._pending[path] = (stamp, now)
+                elif now - seen[1] >= SETTLE_SECONDS:
+                    del self._pending[path]
+                    try:
+                        is_archive = Extractor.is_archive(path)
+                    except OSError:
+                        continue
+                    if is_archive:
+                        self._queued.add(path)
+                        ready.append((path, stamp))
+                    else:
+                        self._ignored[path] = stamp
+        return ready
+
+    def _process(self, path, stamp):
+        try:
+            output_dir = Extractor.strip_extension(path)
+            with self._lock:
+                self.output_dirs.add(output_dir)
+            self.handle(path, output_dir)
+        except Exception as e:
+            print(f"Watch: failed to process {path}: {e}")
+        finally:
+            with self._lock:
+                # 失败的文件同样记为已处理，只有内容变化后才会重试
+                self.handled[path] = stamp
+                self._queued.discard(path)
+                self._save()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        observer = _start_observer(self)
+        if observer is not None:
+            print(f"Watching {self.directory} (inotify)")
+        else:
+            print(f"Watching {self.directory} (polling every {POLL_INTERVAL:g}s)")
+        self._scan()
+        try:
+            with ThreadPoolExecutor(self.workers) as pool:
+                while not self._stopped.wait(POLL_INTERVAL if observer is None else 0.5):
+                    if observer is None:
+                        self._scan()
+                    for path, stamp in self._ready():
+                        pool.submit(self._process, path, stamp)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
@@ -1,7 +1,42 @@
-﻿import keyring
-from webdav3.client import Client
+﻿import contextlib
+import gzip
+import hashlib
 import json
-import io
+import os
+import threading
+
+PASSWORDS_FILE = 'passwords.txt'
+MAPPINGS_FILE = 'mappings.json'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 2
+SHARDS_DIR = 'shards/'
+# 分片键取 sha1 的前几位十六进制，2 位即 256 个分片
+SHARD_PREFIX = 2
+PUSH_RETRIES = 3
+
+
+def shard_id(kind, key):
+    return f"{kind}/{hashlib.sha1(key.encode('utf-8')).hexdigest()[:SHARD_PREFIX]}"
+
+
+def shard_path(shard, digest):
+    # 分片文件按内容寻址，并发写入的客户端不会互相覆盖
+    return f"{SHARDS_DIR}{shard}-{digest[:16]}.gz"
+
+
+def encode_shard(shard, items):
+    if shard.startswith('passwords/'):
+        raw = '\n'.join(sorted(items)).encode('utf-8')
+    else:
+        raw = json.dumps(items, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest(), gzip.compress(raw)
+
+
+def decode_shard(shard, content):
+    raw = gzip.decompress(content).decode('utf-8')
+    if shard.startswith('passwords/'):
+        return raw.splitlines()
+    return json.loads(raw)
 
 class WebDAVClient:
     def __init__(self, config):
@@ -9,7 +44,14 @@ class WebDAVClient:
         self.client = None
         self.username = config.get('username')
         self.password = self.get_password_from_keyring()
+        self.state_file = config.get('state_file')
+        self.state = self._load_state()
+        self._remote_ready = False
+        # 后台同步和手动 upload 可能同时进行，二者都改 state 和待推送文件，需串行执行
+        self.lock = threading.Lock()
         if config['url']:
+            # webdav3 只在真正连接时才导入
+            from webdav3.client import Client
             options = {
                 'webdav_hostname': config['url'],
                 'webdav_login': self.username,
@@ -19,6 +61,7 @@ class WebDAVClient:
 
     def get_password_from_keyring(self):
         """Retrieve the password securely from the keyring."""
+        import keyring
         password = keyring.get_password('webdav', self.username)
         if password is None:
             print("No password found in keyring, prompting for password...")
@@ -31,37 +74,195 @@ class WebDAVClient:
         """Ensure remote directory exists"""
         if not self.client:
             return False
+        if self._remote_ready:
+            return True
         try:
             if not self.client.check("/dav"):
                 self.client.mkdir("/dav")
+            self._remote_ready = True
             return True
         except Exception as e:
             print(f"Failed to ensure remote directory: {e}")
             return False
 
-    def sync(self, password_manager, mapping_manager):
-        self.list_remote_files()
-        if not self.client or not self.ensure_remote_directory():
+    def _load_state(self):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self):
+        if not self.state_file:
             return
-        
-        # Sync passwords
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+
+    def _get(self, remote, etag=None):
+        """Conditional GET: returns (None, etag) when the remote copy is unchanged"""
+        from webdav3.urn import Urn
+        headers = ['Accept-Encoding: gzip']
+        if etag:
+            headers.append(f'If-None-Match: {etag}')
+        response = self.client.execute_request('download', Urn(remote).quote(), headers_ext=headers)
+        if response.status_code == 304:
+            return None, etag
+        return response.content, response.headers.get('ETag')
+
+    def _put(self, remote, content, etag=None, create=False):
+        """PUT guarded by If-Match/If-None-Match so concurrent writers cannot clobber each other"""
+        from webdav3.urn import Urn
+        headers = []
+        if etag:
+            headers.append(f'If-Match: {etag}')
+        elif create:
+            headers.append('If-None-Match: *')
+        response = self.client.execute_request('upload', Urn(remote).quote(), data=content, headers_ext=headers)
+        return response.headers.get('ETag')
+
+    def _merge_legacy(self, password_manager, mapping_manager):
+        """Merge the old two-file remote layout, skipping files whose ETag is unchanged"""
+        from webdav3.exceptions import RemoteResourceNotFound
+        etags = self.state.setdefault('legacy_etags', {})
+        for remote in (PASSWORDS_FILE, MAPPINGS_FILE):
+            try:
+                content, etags[remote] = self._get(remote, etags.get(remote))
+            except RemoteResourceNotFound:
+                continue
+            if not content:
+                continue
+            if remote == PASSWORDS_FILE:
+                password_manager.merge(content.decode('utf-8').splitlines(), track=False)
+            else:
+                mapping_manager.update(json.loads(content.decode('utf-8')), track=False)
+
+    def _fetch_shard(self, shard, digest):
+        content, _ = self._get(shard_path(shard, digest))
+        return decode_shard(shard, content)
+
+    def _pull(self, password_manager, mapping_manager, trace=None):
+        """Fetch only the shards whose digest changed; one request if nothing changed"""
+        from webdav3.exceptions import RemoteResourceNotFound
+        phase = trace.phase if trace else lambda name: contextlib.nullcontext()
         try:
-            remote_pwd_content = self.client.get_file_content('passwords.txt')
-            if remote_pwd_content:
-                remote_pwd = remote_pwd_content.decode('utf-8').splitlines()
-                password_manager.merge(remote_pwd)
-        except Exception as e:
-            print(f"Password sync failed: {e}")
+            content, etag = self._get(MANIFEST_FILE, self.state.get('manifest_etag'))
+        except RemoteResourceNotFound:
+            # 远端还是旧的两文件布局，首次推送时整体迁移为分片
+            self._merge_legacy(password_manager, mapping_manager)
+            self.state.pop('shards', None)
+            self.state.pop('manifest_etag', None)
+            self._save_state()
+            return
+        if content is None:
+            return
+        manifest = json.loads(content.decode('utf-8'))
+        applied = self.state.get('shards', {})
+        for shard, digest in manifest['shards'].items():
+            if applied.get(shard) == digest:
+                continue
+            with phase('fetch'):
+                items = self._fetch_shard(shard, digest)
+            with phase('merge'):
+                if shard.startswith('passwords/'):
+                    password_manager.merge(items, track=False)
+                else:
+                    mapping_manager.update(items, track=False)
+            if trace:
+                trace.count('shards')
+                trace.count('entries', len(items))
+        self.state['shards'] = manifest['shards']
+        self.state['manifest_etag'] = etag
+        self.state['manifest_size'] = len(content)
+        self._save_state()
+
+    def _build_shards(self, shards, passwords, mappings):
+        """Encode the given entries grouped by shard, merged with what the remote shard holds"""
+        groups = {}
+        for password in passwords:
+            groups.setdefault(shard_id('passwords', password), set()).add(password)
+        for key, password in mappings.items():
+            groups.setdefault(shard_id('mappings', key), {})[key] = password
+        built = {}
+        for shard, items in groups.items():
+            if shard in shards:
+                remote = self._fetch_shard(shard, shards[shard])
+                if isinstance(items, set):
+                    items.update(remote)
+                else:
+                    items = {**remote, **items}
+            built[shard] = encode_shard(shard, items)
+        return built
+
+    def _push(self, password_manager, mapping_manager, full=False):
+        """Upload only the shards touched by pending local changes, or every shard when full"""
+        from webdav3.exceptions import ResponseErrorCode
+        passwords = password_manager.pending()
+        mappings = mapping_manager.pending()
+        if 'shards' not in self.state:
+            full = True
+        if not passwords and not mappings and not full:
+            return
+        for kind in ('passwords', 'mappings'):
+            if not self.client.check(f"{SHARDS_DIR}{kind}/"):
+                self.client.mkdir(f"{SHARDS_DIR}{kind}/", recursive=True)
+
+        for _ in range(PUSH_RETRIES):
+            shards = self.state.get('shards', {})
+            if full:
+                # 本地已合并远端全部内容，直接按本地全集分片，只上传摘要不同的分片
+                built = self._build_shards({}, password_manager.passwords, mapping_manager.snapshot())
+            else:
+                built = self._build_shards(shards, passwords, mappings)
+            changed = {shard: v for shard, v in built.items() if shards.get(shard) != v[0]}
+            for shard, (digest, blob) in changed.items():
+                self._put(shard_path(shard, digest), blob)
+            new_shards = {**shards, **{shard: digest for shard, (digest, _) in changed.items()}}
+            manifest = json.dumps({'version': MANIFEST_VERSION, 'shards': new_shards}, sort_keys=True).encode('utf-8')
+            if len(manifest) == self.state.get('manifest_size'):
+                # 不少服务器用 修改时间(秒)+大小 生成 ETag，同一秒内改写同样大小的清单
+                # 会得到相同的 ETag，让并发检测失效；改变大小保证 ETag 一定变化
+                manifest += b'\n'
+            try:
+                etag = self._put(MANIFEST_FILE, manifest, etag=self.state.get('manifest_etag'), create=True)
+            except ResponseErrorCode as e:
+                if e.code != 412:
+                    raise
+                # 其他客户端抢先更新了清单：先合并再重试
+                self._pull(password_manager, mapping_manager)
+                continue
+            self.state['shards'] = new_shards
+            self.state['manifest_etag'] = etag
+            self.state['manifest_size'] = len(manifest)
+            self._save_state()
+            password_manager.clear_pending()
+            mapping_manager.clear_pending()
+            for shard in changed:
+                if shard in shards:
+                    try:
+                        self.client.clean(shard_path(shard, shards[shard]))
+                    except Exception as e:
+                        print(f"Failed to remove old shard {shard}: {e}")
+            return
+        raise RuntimeError("Remote manifest keeps changing, giving up for now")
+
+    def sync(self, password_manager, mapping_manager, trace=None):
+        """Pull remote changes and push pending local ones; returns False on failure.
+
+        Phase timings are added to trace when one is given.
+        """
+        phase = trace.phase if trace else lambda name: contextlib.nullcontext()
+        if not self.client or not self.ensure_remote_directory():
+            return False
 
-        # Sync mappings
         try:
-            remote_map_content = self.client.get_file_content('mappings.json')
-            if remote_map_content:
-                remote_map = json.loads(remote_map_content.decode('utf-8'))
-                mapping_manager.mappings.update(remote_map)
-                mapping_manager._save()
+            with self.lock:
+                with phase('pull'):
+                    self._pull(password_manager, mapping_manager, trace)
+                with phase('push'):
+                    self._push(password_manager, mapping_manager)
+            return True
         except Exception as e:
-            print(f"Mapping sync failed: {e}")
+            print(f"Sync failed: {e}")
+            return False
 
     def upload_and_sync(self, password_manager, mapping_manager):
         if not self.client or not self.ensure_remote_directory():
@@ -69,37 +270,9 @@ class WebDAVClient:
             return
 
         try:
-            # Download remote files into memory
-            remote_files = {'passwords.txt': None, 'mappings.json': None}
-            for remote in remote_files:
-                try:
-                    content = self.client.get_file_content(remote)
-                    if content:
-                        remote_files[remote] = content.decode('utf-8')
-                except Exception as e:
-                    print(f"Remote file {remote} not found or download failed: {e}")
-                    remote_files[remote] = ''  # Set empty if file does not exist
-
-            # Merge password
-            if remote_files['passwords.txt']:
-                remote_pwd = remote_files['passwords.txt'].splitlines()
-                password_manager.merge(remote_pwd)
-
-            # Merge mappings
-            if remote_files['mappings.json']:
-                remote_map = json.loads(remote_files['mappings.json'])
-                mapping_manager.mappings.update(remote_map)
-                mapping_manager._save()
-
-            # Upload the merged files to remote
-            self.client.upload_to(
-                'passwords.txt',
-                io.BytesIO('\n'.join(password_manager.passwords).encode('utf-8'))
-            )
-            self.client.upload_to(
-                'mappings.json',
-                io.BytesIO(json.dumps(mapping_manager.mappings, indent=2).encode('utf-8'))
-            )
+            with self.lock:
+                self._pull(password_manager, mapping_manager)
+                self._push(password_manager, mapping_manager, full=True)
             print("Upload and sync completed.")
         except Exception as e:
             print(f"Upload and sync failed: {e}")
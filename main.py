@@ -1,4 +1,15 @@
-﻿from dp.cli import DpCLI
+﻿import shlex
+import sys
 
 if __name__ == "__main__":
-    DpCLI().cmdloop()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == 'submit':
+        # 瘦客户端只依赖标准库，不加载任何管理器
+        from dp.core.server import split_socket_option, submit
+        socket_path, args = split_socket_option(sys.argv[2:])
+        sys.exit(0 if submit(args, socket_path) else 1)
+
+    from dp.cli import DpCLI
+    if len(sys.argv) > 1:
+        DpCLI().onecmd(shlex.join(sys.argv[1:]))
+    else:
+        DpCLI().cmdloop()
\ No newline at end of file
@@ -0,0 +1,11 @@
+﻿from dp.core.startup import STARTUP_BUDGET_SECONDS, check_startup
+
+
+def test_cold_start_skips_heavy_modules():
+    _, loaded = check_startup(runs=1)
+    assert not loaded, f"heavy modules imported at startup: {', '.join(loaded)}"
+
+
+def test_cold_start_within_budget():
+    elapsed, _ = check_startup()
+    assert elapsed <= STARTUP_BUDGET_SECONDS, f"startup took {elapsed * 1000:.0f} ms"
@@ -0,0 +1,146 @@
+﻿import json
+import threading
+
+import pytest
+
+pytest.importorskip('webdav3')
+wsgidav_app = pytest.importorskip('wsgidav.wsgidav_app')
+wsgi = pytest.importorskip('cheroot.wsgi')
+
+from dp.core.mapping_manager import MappingManager
+from dp.core.password_manager import PasswordManager
+from dp.core.webdav import MANIFEST_FILE, MAPPINGS_FILE, PASSWORDS_FILE, WebDAVClient
+
+
+class _Recorder:
+    """WSGI middleware that records (method, path, status) of every request"""
+
+    def __init__(self, app):
+        self.app = app
+        self.requests = []
+
+    def __call__(self, environ, start_response):
+        def record(status, headers, exc_info=None):
+            self.requests.append((environ['REQUEST_METHOD'], environ['PATH_INFO'], int(status.split()[0])))
+            return start_response(status, headers, exc_info)
+        return self.app(environ, record)
+
+    def take(self):
+        requests, self.requests = self.requests, []
+        return requests
+
+
+@pytest.fixture
+def server(tmp_path):
+    root = tmp_path / 'remote'
+    root.mkdir()
+    app = wsgidav_app.WsgiDAVApp({
+        'provider_mapping': {'/': str(root)},
+        'simple_dc': {'user_mapping': {'*': True}},
+        'verbose': 0,
+        'logging': {'enable': False},
+    })
+    recorder = _Recorder(app)
+    httpd = wsgi.Server(('127.0.0.1', 0), recorder)
+    httpd.prepare()
+    thread = threading.Thread(target=httpd.serve, daemon=True)
+    thread.start()
+    host, port = httpd.bind_addr
+    yield f"http://{host}:{port}", root, recorder
+    httpd.stop()
+
+
+@pytest.fixture(autouse=True)
+def no_keyring(monkeypatch):
+    monkeypatch.setattr(WebDAVClient, 'get_password_from_keyring', lambda self: 'secret')
+
+
+def _client(url, tmp_path, name):
+    local = tmp_path / name
+    local.mkdir()
+    webdav = WebDAVClient({'url': url, 'username': name, 'state_file': str(local / 'sync_state.json')})
+    pm = PasswordManager(str(local / 'passwords.txt'))
+    mm = MappingManager(str(local / 'mappings.json'), str(local / 'fingerprints.json'))
+    return webdav, pm, mm
+
+
+def _puts(requests):
+    return [path for method, path, _ in requests if method == 'PUT']
+
+
+def test_two_clients_push_and_pull(server, tmp_path):
+    url, _, _ = server
+    a, pm_a, mm_a = _client(url, tmp_path, 'a')
+    b, pm_b, mm_b = _client(url, tmp_path, 'b')
+    pm_a.merge(['alpha', 'beta'])
+    mm_a.update({'fp1:' + '0' * 64: 'alpha'})
+    assert a.sync(pm_a, mm_a)
+    assert b.sync(pm_b, mm_b)
+    assert {'alpha', 'beta'} <= set(pm_b.passwords)
+    assert mm_b.mappings['fp1:' + '0' * 64] == 'alpha'
+
+
+def test_idle_sync_is_one_conditional_get(server, tmp_path):
+    url, _, recorder = server
+    a, pm, mm = _client(url, tmp_path, 'a')
+    pm.add('alpha')
+    assert a.sync(pm, mm)
+    recorder.take()
+    assert a.sync(pm, mm)
+    assert recorder.take() == [('GET', '/' + MANIFEST_FILE, 304)]
+
+
+def test_one_entry_push_touches_one_shard(server, tmp_path):
+    url, _, recorder = server
+    a, pm, mm = _client(url, tmp_path, 'a')
+    pm.merge([f"pw{i}" for i in range(500)])
+    assert a.sync(pm, mm)
+    recorder.take()
+    pm.add('one-more')
+    assert a.sync(pm, mm)
+    puts = _puts(recorder.take())
+    shards = [p for p in puts if p != '/' + MANIFEST_FILE]
+    assert len(shards) == 1 and shards[0].startswith('/shards/passwords/')
+    assert puts[-1] == '/' + MANIFEST_FILE
+
+
+def test_conflicting_push_is_retried_after_pull(server, tmp_path, monkeypatch):
+    url, _, recorder = server
+    a, pm_a, mm_a = _client(url, tmp_path, 'a')
+    b, pm_b, mm_b = _client(url, tmp_path, 'b')
+    assert a.sync(pm_a, mm_a)
+    assert b.sync(pm_b, mm_b)
+
+    # b 在 a 拉取之后、推送之前更新清单，a 的 If-Match 必然失败
+    pull = a._pull
+
+    def racing_pull(*args, **kwargs):
+        pull(*args, **kwargs)
+        monkeypatch.setattr(a, '_pull', pull)
+        pm_b.add('from-b')
+        assert b.sync(pm_b, mm_b)
+
+    monkeypatch.setattr(a, '_pull', racing_pull)
+    pm_a.add('from-a')
+    recorder.take()
+    assert a.sync(pm_a, mm_a)
+    assert ('PUT', '/' + MANIFEST_FILE, 412) in recorder.take()
+    assert 'from-b' in pm_a
+    assert b.sync(pm_b, mm_b)
+    assert 'from-a' in pm_b
+
+
+def test_legacy_layout_is_migrated_to_shards(server, tmp_path):
+    url, root, _ = server
+    (root / PASSWORDS_FILE).write_text('old1\nold2\n', encoding='utf-8')
+    (root / MAPPINGS_FILE).write_text(json.dumps({'a' * 64: 'old1'}), encoding='utf-8')
+    a, pm, mm = _client(url, tmp_path, 'a')
+    assert a.sync(pm, mm)
+    assert {'old1', 'old2'} <= set(pm.passwords)
+    assert mm.mappings['a' * 64] == 'old1'
+    manifest = json.loads((root / MANIFEST_FILE).read_text(encoding='utf-8'))
+    assert any(shard.startswith('passwords/') for shard in manifest['shards'])
+
+    b, pm_b, mm_b = _client(url, tmp_path, 'b')
+    assert b.sync(pm_b, mm_b)
+    assert {'old1', 'old2'} <= set(pm_b.passwords)